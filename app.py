@@ -1,10 +1,7 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import numpy as np
-from io import StringIO
+from datetime import datetime
+import math
+import time
 
 # Configure page
 st.set_page_config(
@@ -14,13 +11,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Import custom modules
-from utils.data_processor import DataProcessor
-from utils.anomaly_detector import AnomalyDetector
-from utils.chart_generator import ChartGenerator
-from components.sidebar import render_sidebar
-from components.kpi_cards import render_kpi_cards
-from components.anomaly_details import render_anomaly_details
+# Import custom modules; the sidebar renders on every page, everything else
+# (pandas, numpy, plotly and the utils modules) is imported by the page that uses it
+from components.sidebar import render_sidebar, render_threshold_controls
 
 def main():
     """Main application function"""
@@ -33,9 +26,19 @@ def main():
     if 'selected_anomaly' not in st.session_state:
         st.session_state.selected_anomaly = None
     
+    # Pick up a finished background job before anything renders
+    job = collect_background_job()
+    
     # Render sidebar and get navigation choice
     page = render_sidebar()
     
+    # What-if threshold controls for the loaded dataset
+    if st.session_state.processed_data is not None:
+        st.session_state.thresholds = render_threshold_controls(
+            st.session_state.processed_data['explorer'],
+            st.session_state.processed_data['thresholds']
+        )
+    
     # Main content area
     if page == "Dashboard":
         render_dashboard()
@@ -45,44 +48,218 @@ def main():
         render_anomaly_details_page()
     elif page == "Export":
         render_export_page()
+    
+    # The dashboard polls its own job; other pages keep polling so the result attaches wherever the user is
+    if job is not None and page != "Dashboard":
+        from components.job_progress import render_job_progress
+        with st.sidebar:
+            render_job_progress(job)
+        time.sleep(0.5)
+        st.rerun()
+
+# Anomaly fingerprints from earlier runs, kept across restarts to tell new anomalies from recurring ones
+FINGERPRINT_STORE_PATH = "anomaly_fingerprints.npz"
+
+# Uploads processed at once across all sessions; None sizes the pool from the CPU count
+BACKGROUND_WORKERS = None
+
+@st.cache_resource
+def get_background_processor():
+    """Get the worker pool shared by every session on this server"""
+    from utils.background_worker import BackgroundProcessor
+    from utils.fingerprint_store import FingerprintStore
+    return BackgroundProcessor(max_workers=BACKGROUND_WORKERS, fingerprints=FingerprintStore(FINGERPRINT_STORE_PATH))
+
+@st.cache_resource
+def get_figure_cache():
+    """Get the figure cache shared by every session on this server"""
+    from utils.figure_cache import FigureCache
+    return FigureCache()
+
+def attach_dataset(data, processed_data):
+    """Make a processed dataset the current one for this session"""
+    st.session_state.uploaded_data = data
+    st.session_state.processed_data = processed_data
+    
+    # Start the threshold sliders from the defaults for the new dataset
+    for key in [key for key in st.session_state if str(key).startswith('threshold_')]:
+        del st.session_state[key]
+
+def collect_background_job():
+    """Attach this session's background job once it has finished, or get it while it is still running"""
+    dataset_id = st.session_state.get('pending_dataset')
+    if dataset_id is None:
+        return None
+    
+    processor = get_background_processor()
+    job = processor.get(dataset_id)
+    
+    if job is None:
+        st.session_state.pending_dataset = None
+    elif job.status == 'done':
+        attach_dataset(job.data, job.result)
+        processor.discard(dataset_id)
+        st.session_state.pending_dataset = None
+    elif job.status == 'running':
+        return job
+    return None
+
+def get_current_thresholds():
+    """Get the rule thresholds selected in the sidebar"""
+    return st.session_state.get('thresholds') or st.session_state.processed_data['thresholds']
+
+def get_current_anomalies():
+    """Get the anomalies for the thresholds selected in the sidebar"""
+    processed = st.session_state.processed_data
+    thresholds = get_current_thresholds()
+    
+    if thresholds == processed['thresholds']:
+        return processed['anomalies']
+    
+    # Reuse the last what-if result until a slider moves
+    key = tuple(sorted(thresholds.items()))
+    if processed['whatif'] is None or processed['whatif'][0] != key:
+        processed['whatif'] = (key, processed['explorer'].anomalies(thresholds))
+    
+    return processed['whatif'][1]
+
+def render_new_anomaly_filter(anomalies, key):
+    """Show how the anomalies compare with earlier runs, and optionally keep only the new ones"""
+    processed = st.session_state.processed_data
+    baseline = processed.get('fingerprints')
+    if baseline is None:
+        return anomalies
+    
+    # The history holds the rules that fired at the default thresholds, so what-if anomalies are
+    # looked up by those rules (anomalies only the what-if thresholds flag were never recorded)
+    rule_bits = None
+    whatif = get_current_thresholds() != processed['thresholds']
+    if whatif:
+        rule_bits = processed['anomalies']['anomaly_rules'].reindex(anomalies.index, fill_value=0)
+    
+    split = baseline.split(anomalies, processed['user_ids'], processed['source'], rule_bits)
+    last_label = baseline.last_label(processed['source'])
+    st.caption(
+        f"🆕 {len(split['new'])} new · 🔁 {len(split['recurring'])} seen in earlier runs of "
+        f"'{processed['source']}' · ✅ {len(split['resolved'])} from the last run"
+        + (f" ({last_label})" if last_label else "") + " resolved"
+        + (" · compared by the rules that fire at the default thresholds" if whatif else "")
+    )
+    
+    if st.checkbox("Show only new anomalies", key=key):
+        return split['new']
+    return anomalies
 
 def render_dashboard():
     """Render the main dashboard page"""
+    import numpy as np
+    from components.kpi_cards import render_kpi_cards
+    from components.job_progress import render_job_progress
+    from utils.data_processor import DataProcessor
+    
     st.title("📊 Telecom Billing Analyzer")
     st.markdown("Upload your billing data to detect anomalies and analyze patterns")
     
-    # File uploader
-    uploaded_file = st.file_uploader(
-        "Choose a CSV file",
-        type="csv",
-        help="Upload CSV with columns: user_id, billed_amount, expected_amount, data_usage_mb, expected_vs_actual_diff"
+    # Either one combined CSV, or separate billing and usage extracts joined on user and cycle
+    input_mode = st.radio(
+        "Input",
+        ["Single file", "Separate billing and usage files"],
+        horizontal=True,
+        label_visibility="collapsed"
     )
     
-    if uploaded_file is not None:
+    if input_mode == "Single file":
+        # File uploader
+        uploaded_file = st.file_uploader(
+            "Choose a CSV file",
+            type="csv",
+            help="Upload CSV with columns: user_id, billed_amount, expected_amount, data_usage_mb, expected_vs_actual_diff"
+        )
+        uploads = [uploaded_file] if uploaded_file is not None else []
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            billing_file = st.file_uploader(
+                "Choose the billing CSV",
+                type="csv",
+                help="Upload CSV with columns: user_id, billing_cycle, billed_amount, and expected_amount or plan_id"
+            )
+        with col2:
+            usage_file = st.file_uploader(
+                "Choose the usage CSV",
+                type="csv",
+                help="Upload CSV with columns: user_id, billing_cycle, data_usage_mb"
+            )
+        uploads = [billing_file, usage_file] if billing_file is not None and usage_file is not None else []
+    
+    # Optional rate plans: expected amounts are then computed from plan_id and data usage
+    with st.expander("⚙️ Rate Plans (optional)"):
+        plans_file = st.file_uploader(
+            "Choose a rate plan table (JSON)",
+            type="json",
+            help="Tiered pricing per plan; see rate_plans.json for the format. "
+                 "With it, the CSV needs plan_id instead of expected_amount and expected_vs_actual_diff."
+        )
+    
+    # Optional anomaly rules replacing the built-in ones
+    with st.expander("🧮 Anomaly Rules (optional)"):
+        rules_file = st.file_uploader(
+            "Choose a rule set (JSON)",
+            type="json",
+            help="Rules as expressions over the columns with adjustable thresholds; see rules.json for the format."
+        )
+    
+    if uploads:
         try:
-            # Process uploaded data
-            data = pd.read_csv(uploaded_file)
-            st.session_state.uploaded_data = data
-            
-            # Validate required columns
-            required_columns = ['user_id', 'billed_amount', 'expected_amount', 'data_usage_mb', 'expected_vs_actual_diff']
-            missing_columns = [col for col in required_columns if col not in data.columns]
+            rate_plans = None
+            dataset_id = "+".join(upload.file_id for upload in uploads)
             
-            if missing_columns:
-                st.error(f"Missing required columns: {', '.join(missing_columns)}")
-                return
+            # Anomalies are compared with earlier runs of the data source picked in the sidebar;
+            # the file names only label the run
+            source = st.session_state.get('data_source', '').strip() or "default"
+            label = "+".join(upload.name for upload in uploads)
+            dataset_id = f"{dataset_id}@{source}"
+            if plans_file is not None:
+                from utils.rate_plan_engine import RatePlanEngine
+                rate_plans = RatePlanEngine.from_json(plans_file.getvalue().decode('utf-8'))
+                dataset_id = f"{dataset_id}:{plans_file.file_id}"
             
-            # Process data for anomalies
-            processor = DataProcessor()
-            detector = AnomalyDetector()
+            rule_set = None
+            if rules_file is not None:
+                from utils.rule_engine import RuleSet
+                rule_set = RuleSet.from_json(rules_file.getvalue().decode('utf-8'))
+                dataset_id = f"{dataset_id}:{rules_file.file_id}"
             
-            processed_data = processor.process_data(data)
-            anomalies = detector.detect_anomalies(processed_data)
+            # Process each file once on the worker pool; reruns reattach to the running job
+            current = st.session_state.processed_data
+            if current is None or current['dataset_id'] != dataset_id:
+                processor = get_background_processor()
+                job = processor.get(dataset_id)
+                if job is None and len(uploads) == 2:
+                    job = processor.submit_reconciliation(
+                        dataset_id, uploads[0].getvalue(), uploads[1].getvalue(), rate_plans, rule_set, source, label
+                    )
+                elif job is None:
+                    job = processor.submit(dataset_id, uploads[0].getvalue(), rate_plans, rule_set, source, label)
+                st.session_state.pending_dataset = dataset_id
+                
+                # A failed job is kept until retried, so reruns show its error instead of reprocessing
+                if job.status == 'failed':
+                    st.error(f"Error processing file: {job.error}")
+                    if st.button("🔁 Retry"):
+                        processor.discard(dataset_id)
+                        st.rerun()
+                    return
+                
+                # Poll for progress and show estimates; the run after it finishes attaches the exact results
+                if job.status == 'running':
+                    render_job_progress(job)
+                    render_preview(job.preview())
+                    time.sleep(0.5)
+                st.rerun()
             
-            st.session_state.processed_data = {
-                'data': processed_data,
-                'anomalies': anomalies
-            }
+            processed_data = st.session_state.processed_data['data']
+            anomalies = get_current_anomalies()
             
             # Display KPIs
             render_kpi_cards(processed_data, anomalies)
@@ -92,8 +269,8 @@ def render_dashboard():
             
             # Add anomaly status to display
             display_data = processed_data.copy()
-            display_data['Status'] = display_data['user_id'].apply(
-                lambda x: '🚨 Anomaly' if x in anomalies['user_id'].values else '✅ Normal'
+            display_data['Status'] = np.where(
+                DataProcessor.users_in(display_data, anomalies), '🚨 Anomaly', '✅ Normal'
             )
             
             st.dataframe(
@@ -108,42 +285,104 @@ def render_dashboard():
                 col1, col2 = st.columns([3, 1])
                 with col1:
                     st.write(f"Found {len(anomalies)} anomalous billing records")
+                    
+                    # Per-rule counts for the current thresholds
+                    rule_counts = st.session_state.processed_data['explorer'].count_anomalies(get_current_thresholds())
+                    st.caption(" · ".join(
+                        f"{name.replace('_', ' ')}: {count}" for name, count in rule_counts.items() if name != 'total'
+                    ))
                 with col2:
                     if st.button("View All Anomalies", type="primary"):
                         st.session_state.selected_page = "Anomaly Details"
                         st.rerun()
                 
-                # Show top 5 anomalies
+                # Show top 5 anomalies; what-if reasons are only formatted for the rows shown
+                detector = st.session_state.processed_data['detector']
+                top_anomalies = detector.describe_anomalies(
+                    detector.top_anomalies(anomalies, 5), get_current_thresholds()
+                )
                 st.dataframe(
-                    anomalies.head()[['user_id', 'billed_amount', 'expected_amount', 'anomaly_reason']],
+                    top_anomalies[['user_id', 'billed_amount', 'expected_amount', 'anomaly_reason']],
                     use_container_width=True
                 )
             
+            render_unmatched_records(st.session_state.processed_data.get('unmatched'), limit=20)
+            render_unrated_records(st.session_state.processed_data.get('unrated'), limit=20)
+            
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
     
     else:
         # Show sample data option
-        st.info("👆 Upload a CSV file to get started, or try with sample data below")
+        st.info("👆 Upload a CSV file (or a billing and a usage file) to get started, or try with sample data below")
         
         if st.button("Load Sample Data", type="secondary"):
             sample_data = generate_sample_data()
             st.session_state.uploaded_data = sample_data
             
-            processor = DataProcessor()
-            detector = AnomalyDetector()
-            
-            processed_data = processor.process_data(sample_data)
-            anomalies = detector.detect_anomalies(processed_data)
-            
-            st.session_state.processed_data = {
-                'data': processed_data,
-                'anomalies': anomalies
-            }
+            from utils.pipeline import analyze_dataset
+            attach_dataset(sample_data, analyze_dataset(sample_data, 'sample'))
             st.rerun()
 
+def render_unmatched_records(unmatched, limit=None):
+    """Render the records a billing/usage reconciliation could not pair up"""
+    if unmatched is None or len(unmatched) == 0:
+        return
+    
+    st.subheader("🔗 Unmatched Records")
+    
+    side_counts = unmatched['unmatched_side'].value_counts()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Bills Without Usage", int(side_counts.get('billing', 0)))
+    with col2:
+        st.metric("Usage Without a Bill", int(side_counts.get('usage', 0)))
+    
+    columns = [col for col in ['user_id', 'billing_cycle', 'billed_amount', 'data_usage_mb', 'anomaly_reason']
+               if col in unmatched.columns]
+    st.dataframe(unmatched[columns] if limit is None else unmatched[columns].head(limit), use_container_width=True)
+
+def render_unrated_records(unrated, limit=None):
+    """Render the bills the rate plan table could not price, which the anomaly rules never saw"""
+    if unrated is None or len(unrated) == 0:
+        return
+    
+    st.subheader("🏷️ Unrated Bills")
+    st.warning(
+        f"{len(unrated):,} bills have no expected amount (unknown rate plan or no data usage), "
+        f"so the anomaly rules could not check them"
+    )
+    
+    columns = [col for col in ['user_id', 'billing_cycle', 'plan_id', 'billed_amount', 'data_usage_mb', 'anomaly_reason']
+               if col in unrated.columns]
+    st.dataframe(unrated[columns] if limit is None else unrated[columns].head(limit), use_container_width=True)
+
+def render_preview(preview):
+    """Render approximate KPIs and charts from the sample drawn so far"""
+    from components.kpi_cards import render_approximate_kpi_cards
+    from utils.chart_generator import ChartGenerator
+    
+    if preview is None:
+        return
+    
+    render_approximate_kpi_cards(preview)
+    
+    chart_generator = ChartGenerator()
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        line_chart = chart_generator.create_billing_trend_chart(preview['data'])
+        st.plotly_chart(line_chart, use_container_width=True)
+    
+    with col2:
+        pie_chart = chart_generator.create_anomaly_pie_chart(preview['data'], preview['anomalies'])
+        st.plotly_chart(pie_chart, use_container_width=True)
+
 def render_analytics():
     """Render the analytics page"""
+    import numpy as np
+    from utils.chart_generator import ChartGenerator
+    
     st.title("📈 Analytics Dashboard")
     
     if st.session_state.processed_data is None:
@@ -151,25 +390,28 @@ def render_analytics():
         return
     
     data = st.session_state.processed_data['data']
-    anomalies = st.session_state.processed_data['anomalies']
+    anomalies = get_current_anomalies()
     
-    # Generate charts
-    chart_generator = ChartGenerator()
+    # Generate charts; figures are memoized per dataset (and thresholds, for charts of the anomalies)
+    chart_generator = ChartGenerator(get_figure_cache())
+    dataset_id = st.session_state.processed_data['dataset_id']
+    thresholds_key = tuple(sorted(get_current_thresholds().items()))
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Billing Trends")
-        line_chart = chart_generator.create_billing_trend_chart(data)
+        line_chart = chart_generator.create_billing_trend_chart(data, version=dataset_id)
         st.plotly_chart(line_chart, use_container_width=True)
     
     with col2:
         st.subheader("🥧 Normal vs Anomalous Bills")
-        pie_chart = chart_generator.create_anomaly_pie_chart(data, anomalies)
+        pie_chart = chart_generator.create_anomaly_pie_chart(data, anomalies, version=(dataset_id, thresholds_key))
         st.plotly_chart(pie_chart, use_container_width=True)
     
     # Additional analytics
     st.subheader("📋 Detailed Analytics")
+    st.caption("✅ Exact - computed from every record")
     
     col1, col2, col3 = st.columns(3)
     
@@ -194,16 +436,51 @@ def render_analytics():
             f"{anomaly_rate:.1f}%",
             f"{len(anomalies)} of {len(data)} records"
         )
+    
+    # Threshold sweep
+    st.subheader("🎚️ Threshold Sweep")
+    
+    explorer = st.session_state.processed_data['explorer']
+    thresholds = get_current_thresholds()
+    labels = explorer.detector.threshold_labels
+    
+    sweep_param = st.selectbox(
+        "Threshold to sweep:",
+        options=list(labels),
+        format_func=lambda x: labels[x]
+    )
+    
+    # Evaluate every candidate value in one vectorized pass over the presorted column
+    low, high = explorer.value_range(sweep_param)
+    low = min(low, thresholds[sweep_param])
+    high = max(high, thresholds[sweep_param])
+    sweep_data = explorer.sweep(sweep_param, np.linspace(low, high, 200), thresholds)
+    
+    sweep_chart = chart_generator.create_threshold_sweep_chart(
+        sweep_data, thresholds[sweep_param], labels[sweep_param]
+    )
+    st.plotly_chart(sweep_chart, use_container_width=True)
+    
+    # Figure cache instrumentation
+    cache_stats = chart_generator.cache.stats()
+    st.caption(
+        f"Chart cache: {cache_stats['hit_rate']:.0%} hit rate ({cache_stats['hits']} hits, "
+        f"{cache_stats['misses']} misses, {cache_stats['evictions']} evictions) · "
+        f"{cache_stats['figures']} figures, {cache_stats['bytes'] / 1024:.0f} KB"
+    )
 
 def render_anomaly_details_page():
     """Render the anomaly details page"""
+    import pandas as pd
+    import plotly.express as px
+    
     st.title("🔍 Anomaly Details")
     
     if st.session_state.processed_data is None:
         st.warning("Please upload data first from the Dashboard page")
         return
     
-    anomalies = st.session_state.processed_data['anomalies']
+    anomalies = render_new_anomaly_filter(get_current_anomalies(), 'details_new_only')
     
     if len(anomalies) == 0:
         st.info("No anomalies detected in the current dataset")
@@ -211,15 +488,52 @@ def render_anomaly_details_page():
     
     st.subheader(f"Found {len(anomalies)} Anomalous Records")
     
-    # Anomaly selection
-    selected_user = st.selectbox(
+    # Page through the anomalies by severity
+    page_size = 50
+    page_count = math.ceil(len(anomalies) / page_size)
+    page_number = 1
+    if page_count > 1:
+        page_number = st.number_input(
+            f"Page (of {page_count}, {page_size} anomalies per page)",
+            min_value=1,
+            max_value=page_count,
+            value=1,
+            step=1
+        )
+    
+    # The first page only sorts its own rows; deeper pages slice one full severity ordering,
+    # sorted once per threshold setting and filter rather than on every rerun
+    processed = st.session_state.processed_data
+    detector = processed['detector']
+    thresholds = get_current_thresholds()
+    order = None
+    if page_number > 1:
+        key = (tuple(sorted(thresholds.items())), st.session_state.get('details_new_only', False))
+        if processed['ordering'] is None or processed['ordering'][0] != key:
+            processed['ordering'] = (key, detector.severity_order(anomalies))
+        order = processed['ordering'][1]
+    
+    page_anomalies = detector.describe_anomalies(
+        detector.page_anomalies(anomalies, page_number - 1, page_size, order), thresholds
+    )
+    
+    # Anomaly selection by user code; the user_id text is only looked up for display
+    user_ids = st.session_state.processed_data['user_ids']
+    page_codes = page_anomalies['user_code'].tolist()
+    first_rows = {}
+    for position, code in enumerate(page_codes):
+        first_rows.setdefault(code, position)
+    page_billed = page_anomalies['billed_amount'].to_numpy()
+    
+    selected_code = st.selectbox(
         "Select a user to view detailed report:",
-        options=anomalies['user_id'].tolist(),
-        format_func=lambda x: f"User {x} - ${anomalies[anomalies['user_id']==x]['billed_amount'].iloc[0]:.2f}"
+        options=page_codes,
+        format_func=lambda code: f"User {user_ids[code]} - ${page_billed[first_rows[code]]:.2f}"
     )
     
-    if selected_user:
-        anomaly_record = anomalies[anomalies['user_id'] == selected_user].iloc[0]
+    if selected_code is not None:
+        selected_user = user_ids[selected_code]
+        anomaly_record = page_anomalies.iloc[first_rows[selected_code]]
         
         # Detailed report
         st.subheader(f"📋 Detailed Report - User {selected_user}")
@@ -255,9 +569,14 @@ def render_anomaly_details_page():
         
         st.plotly_chart(fig, use_container_width=True)
     
-    # All anomalies table
-    st.subheader("📋 All Anomalies")
-    st.dataframe(anomalies, use_container_width=True)
+    # Anomalies on the current page
+    st.subheader(f"📋 Anomalies - Page {page_number} of {page_count}")
+    st.dataframe(page_anomalies.drop(columns='user_code'), use_container_width=True)
+    
+    # Records a billing/usage reconciliation could not pair up, and bills that could not be rated,
+    # are their own categories
+    render_unmatched_records(st.session_state.processed_data.get('unmatched'))
+    render_unrated_records(st.session_state.processed_data.get('unrated'))
 
 def render_export_page():
     """Render the export page"""
@@ -267,18 +586,24 @@ def render_export_page():
         st.warning("Please upload data first from the Dashboard page")
         return
     
-    anomalies = st.session_state.processed_data['anomalies']
+    anomalies = get_current_anomalies()
     
     st.subheader("Export Options")
+    report_anomalies = render_new_anomaly_filter(anomalies, 'export_new_only')
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.write("**Anomaly Report**")
-        st.write(f"Export {len(anomalies)} anomalous records")
+        st.write(f"Export {len(report_anomalies)} anomalous records")
         
-        if len(anomalies) > 0:
-            csv_data = anomalies.to_csv(index=False)
+        if len(report_anomalies) > 0:
+            # The full severity sort is only paid for the export
+            detector = st.session_state.processed_data['detector']
+            sorted_anomalies = detector.describe_anomalies(
+                detector.sort_anomalies(report_anomalies), get_current_thresholds()
+            )
+            csv_data = sorted_anomalies.drop(columns='user_code').to_csv(index=False)
             st.download_button(
                 label="📥 Download Anomaly Report (CSV)",
                 data=csv_data,
@@ -294,7 +619,7 @@ def render_export_page():
         st.write(f"Export complete processed dataset")
         
         full_data = st.session_state.processed_data['data']
-        csv_data = full_data.to_csv(index=False)
+        csv_data = full_data.drop(columns='user_code').to_csv(index=False)
         st.download_button(
             label="📥 Download Full Dataset (CSV)",
             data=csv_data,
@@ -302,8 +627,33 @@ def render_export_page():
             mime="text/csv"
         )
     
+    # Records a billing/usage reconciliation could not pair up
+    unmatched = st.session_state.processed_data.get('unmatched')
+    if unmatched is not None and len(unmatched) > 0:
+        st.write("**Unmatched Records**")
+        st.write(f"Export {len(unmatched)} billing and usage records without a counterpart")
+        st.download_button(
+            label="📥 Download Unmatched Records (CSV)",
+            data=unmatched.to_csv(index=False),
+            file_name=f"unmatched_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+    
+    # Bills the rate plan table could not price
+    unrated = st.session_state.processed_data.get('unrated')
+    if unrated is not None and len(unrated) > 0:
+        st.write("**Unrated Bills**")
+        st.write(f"Export {len(unrated)} bills with an unknown rate plan or no data usage")
+        st.download_button(
+            label="📥 Download Unrated Bills (CSV)",
+            data=unrated.to_csv(index=False),
+            file_name=f"unrated_bills_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+    
     # Export statistics
     st.subheader("📊 Export Statistics")
+    st.caption("✅ Exact - computed from every record")
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -323,6 +673,9 @@ def render_export_page():
 
 def generate_sample_data():
     """Generate sample billing data for demonstration"""
+    import pandas as pd
+    import numpy as np
+    
     np.random.seed(42)
     n_records = 100
     
@@ -0,0 +1,16 @@
+import streamlit as st
+
+def render_job_progress(job):
+    """Render the progress of a background processing job"""
+    progress = job.progress()
+    
+    details = [progress['stage']]
+    if progress['rows']:
+        details.append(f"{progress['rows']:,} rows")
+    if progress['rows_per_sec']:
+        details.append(f"{progress['rows_per_sec']:,.0f} rows/sec")
+    if progress['eta_seconds'] is not None:
+        details.append(f"ETA {progress['eta_seconds']:.0f}s")
+    
+    st.progress(progress['fraction'], text=" · ".join(details))
+    st.caption("Processing continues in the background - you can switch pages and come back")
\ No newline at end of file
@@ -4,6 +4,7 @@ def render_kpi_cards(data, anomalies):
     """Render KPI cards showing key metrics"""
     
     st.subheader("📊 Key Performance Indicators")
+    st.caption("✅ Exact - computed from every record")
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -46,4 +47,68 @@ def render_kpi_cards(data, anomalies):
                 label="⚠️ Avg Anomaly Amount",
                 value="$0.00",
                 help="No anomalies detected"
+            )
+
+def render_approximate_kpi_cards(preview):
+    """Render KPI cards estimated from a stratified sample, with 95% confidence intervals"""
+    metrics = preview['metrics']
+    
+    st.subheader("📊 Key Performance Indicators")
+    source = "the whole file" if preview['coverage'] >= 1 else f"the first {preview['coverage'] * 100:.0f}% of the file"
+    extrapolation = "" if preview['coverage'] >= 1 else " Totals are scaled up to the whole file and have no interval yet."
+    st.caption(
+        f"≈ Approximate - estimated from a stratified sample of {preview['sample_size']:,} rows "
+        f"from {source}; ± is the 95% confidence interval.{extrapolation} "
+        f"Exact values replace these when processing finishes."
+    )
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        records, records_ci = metrics['total_records']
+        st.metric(
+            label="📋 Total Records (approx.)",
+            value=f"≈{records:,.0f}",
+            delta=f"±{records_ci:,.0f}" if records_ci is not None else "extrapolated",
+            delta_color="off",
+            help="Estimated number of valid billing records"
+        )
+    
+    with col2:
+        anomalies, anomalies_ci = metrics['total_anomalies']
+        rate, rate_ci = metrics['anomaly_rate']
+        st.metric(
+            label="🚨 Total Anomalies (approx.)",
+            value=f"≈{anomalies:,.0f}" + (f" ±{anomalies_ci:,.0f}" if anomalies_ci is not None else ""),
+            delta=f"≈{rate:.1f}% ±{rate_ci:.1f}% of total",
+            delta_color="off",
+            help="Estimated number and rate of anomalous billing records"
+        )
+    
+    with col3:
+        avg_billed, avg_billed_ci = metrics['avg_billed_amount']
+        std_billed, _ = metrics['std_billed_amount']
+        st.metric(
+            label="💰 Average Billed Amount (approx.)",
+            value=f"≈${avg_billed:.2f} ±{avg_billed_ci:.2f}",
+            delta=f"±${std_billed:.2f}",
+            delta_color="off",
+            help="Estimated average billing amount; the delta is the estimated standard deviation"
+        )
+    
+    with col4:
+        avg_anomaly, avg_anomaly_ci = metrics['avg_anomaly_amount']
+        if avg_anomaly is not None:
+            st.metric(
+                label="⚠️ Avg Anomaly Amount (approx.)",
+                value=f"≈${avg_anomaly:.2f} ±{avg_anomaly_ci:.2f}",
+                delta=f"+${avg_anomaly - avg_billed:.2f}",
+                delta_color="inverse",
+                help="Estimated average billing amount for anomalous records"
+            )
+        else:
+            st.metric(
+                label="⚠️ Avg Anomaly Amount (approx.)",
+                value="n/a",
+                help="No anomalies in the sample so far"
             )
\ No newline at end of file
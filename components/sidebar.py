@@ -1,3 +1,5 @@
+import math
+
 import streamlit as st
 
 def render_sidebar():
@@ -13,6 +15,15 @@ def render_sidebar():
             index=0
         )
         
+        # Anomalies are compared with earlier uploads of the same data source, whatever the files are called
+        st.text_input(
+            "Data source",
+            value="default",
+            key='data_source',
+            help="Name of the feed these uploads belong to (e.g. one region's monthly files). "
+                 "New and recurring anomalies are worked out against earlier uploads with the same name."
+        )
+        
         st.markdown("---")
         
         # App info
@@ -45,6 +56,55 @@ def render_sidebar():
             - `expected_amount`: Expected billing amount
             - `data_usage_mb`: Data usage in MB
             - `expected_vs_actual_diff`: Difference between expected and actual
+            
+            With a rate plan table loaded, `plan_id` can replace
+            `expected_amount` and `expected_vs_actual_diff`.
             """)
     
-    return page
\ No newline at end of file
+    return page
+
+def reset_threshold_controls(defaults):
+    """Put every threshold slider back to its default value"""
+    for param, value in defaults.items():
+        st.session_state[f"threshold_{param}"] = value
+
+def render_threshold_controls(explorer, defaults):
+    """Render what-if sliders for the anomaly rule thresholds"""
+    thresholds = {}
+    
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🎚️ Anomaly Thresholds")
+        st.caption("Adjust the rules to see how the anomalies change")
+        
+        for param, label in explorer.detector.threshold_labels.items():
+            default = defaults[param]
+            low, high = explorer.value_range(param)
+            
+            # Cover both the data range and the default, in the default's numeric type
+            low = math.floor(min(low, default))
+            high = math.ceil(max(high, default))
+            if high == low:
+                high = low + 1
+            if isinstance(default, float):
+                low, high = float(low), float(high)
+            
+            # Seed the slider once; afterwards its value lives in session state
+            key = f"threshold_{param}"
+            if key not in st.session_state:
+                st.session_state[key] = default
+            
+            thresholds[param] = st.slider(
+                label,
+                min_value=low,
+                max_value=high,
+                key=key
+            )
+        
+        st.button(
+            "Reset Thresholds",
+            on_click=reset_threshold_controls,
+            args=(defaults,)
+        )
+    
+    return thresholds
\ No newline at end of file
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start import time of the app and its modules
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that the headless processing/detection code must never pull in
+UI_PACKAGES = ('streamlit', 'plotly')
+
+# (module, packages it must not load on import)
+TARGETS = [
+    ('utils.data_processor', UI_PACKAGES),
+    ('utils.anomaly_detector', UI_PACKAGES),
+    ('utils.threshold_explorer', UI_PACKAGES),
+    ('utils.chart_generator', UI_PACKAGES),
+    ('utils.pipeline', UI_PACKAGES),
+    ('utils.background_worker', UI_PACKAGES),
+    ('utils.sampler', UI_PACKAGES),
+    ('utils.rate_plan_engine', UI_PACKAGES),
+    ('utils.reconciler', UI_PACKAGES),
+    ('utils.fingerprint_store', UI_PACKAGES),
+    ('utils.rule_engine', UI_PACKAGES),
+    ('utils.figure_cache', UI_PACKAGES),
+    ('components.sidebar', ('plotly.express', 'utils.data_processor', 'utils.anomaly_detector')),
+    ('app', ('plotly.express', 'utils.chart_generator', 'utils.anomaly_detector')),
+]
+
+def measure_import(module):
+    """Import a module in a fresh interpreter, returning (total_ms, heaviest_dependencies, loaded)"""
+    probe = (
+        f"import sys; import {module}; "
+        "print(' '.join(sorted(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    
+    # Lines look like "import time: self [us] | cumulative | imported package", with
+    # nested imports indented by two spaces per level and printed before their parent
+    total_ms = 0.0
+    dependencies = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        ms = int(cumulative) / 1000
+        
+        if depth == 1:
+            dependencies.append((ms, name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                total_ms = ms
+                break
+            dependencies = []
+    
+    heaviest = sorted(dependencies, reverse=True)[:3]
+    loaded = set(result.stdout.split())
+    return total_ms, heaviest, loaded
+
+def main():
+    """Report import times and fail if a module loads packages it should not"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters per module (median is reported)")
+    args = parser.parse_args()
+    
+    print("⏱️  Cold import times (median of %d runs)" % args.runs)
+    print("-" * 50)
+    
+    violations = []
+    for module, forbidden in TARGETS:
+        timings = []
+        for _ in range(args.runs):
+            total_ms, heaviest, loaded = measure_import(module)
+            timings.append(total_ms)
+        
+        print(f"{module:<28} {statistics.median(timings):8.1f} ms")
+        for ms, name in heaviest:
+            print(f"    {name:<24} {ms:8.1f} ms")
+        
+        leaked = [package for package in forbidden if package in loaded]
+        if leaked:
+            violations.append(f"{module} imports {', '.join(leaked)}")
+    
+    print("-" * 50)
+    if violations:
+        for violation in violations:
+            print(f"❌ {violation}")
+        sys.exit(1)
+    
+    print("✅ No module loads packages outside its page")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
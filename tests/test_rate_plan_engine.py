@@ -0,0 +1,39 @@
+import io
+
+import pandas as pd
+import numpy as np
+
+from utils.rate_plan_engine import RatePlanEngine
+from utils.data_processor import DataProcessor
+
+PLANS = {
+    '1': {'base_fee': 100, 'tiers': [{'up_to_mb': 1000, 'per_mb': 0}, {'up_to_mb': None, 'per_mb': 0.1}]},
+    '2': {'base_fee': 300, 'tiers': [{'up_to_mb': None, 'per_mb': 0.05}], 'usage_cap': 200}
+}
+
+def read_billing_csv():
+    """A billing file whose numeric plan_id column has a gap, so pandas reads it as float64"""
+    return pd.read_csv(io.StringIO(
+        "user_id,billed_amount,data_usage_mb,plan_id\n"
+        "U1,150,1500,1\n"
+        "U2,450,8000,2\n"
+        "U3,200,500,\n"
+        "U4,300,500,7\n"
+    ))
+
+def test_float_plan_ids_match_plan_keys():
+    data = read_billing_csv()
+    assert data['plan_id'].dtype == np.float64
+    
+    expected = RatePlanEngine(PLANS).compute_expected_amount(data['plan_id'], data['data_usage_mb'])
+    np.testing.assert_array_equal(expected, [150.0, 500.0, np.nan, np.nan])
+
+def test_only_unpriceable_bills_are_unrated():
+    processor = DataProcessor(RatePlanEngine(PLANS))
+    processed = processor.process_data(read_billing_csv())
+    
+    assert processed['user_id'].tolist() == ['U1', 'U2']
+    assert processor.unrated['user_id'].tolist() == ['U3', 'U4']
+    assert processor.unrated['anomaly_reason'].tolist() == [
+        "Unrated bill (no plan_id)", "Unrated bill (unknown rate plan 7)"
+    ]
\ No newline at end of file
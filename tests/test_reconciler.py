@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pytest
+
+from utils.reconciler import Reconciler
+
+BILLING = (
+    "user_id,billing_cycle,billed_amount,expected_amount\n"
+    "U1,2024-01,100,90\n"
+    "U2,2024-01,200,190\n"
+    ",2024-01,50,50\n"
+    "U4,,60,60\n"
+    "U5,2024-01,70,70\n"
+)
+
+USAGE = (
+    "user_id,billing_cycle,data_usage_mb\n"
+    "U1,2024-01,10\n"
+    "U1,2024-01,5\n"
+    "U2,2024-01,\n"
+    "U2,2024-01,\n"
+    ",2024-01,99\n"
+    "U4,,7\n"
+    "U6,2024-01,3\n"
+)
+
+@pytest.mark.parametrize('partitions', [1, 16])
+def test_reconcile(partitions):
+    joined, unmatched = Reconciler(partitions=partitions).reconcile(
+        io.BytesIO(BILLING.encode()), io.BytesIO(USAGE.encode())
+    )
+    
+    # Usage is totalled per user and cycle; usage missing on every record stays missing
+    usage = joined.set_index('user_id')['data_usage_mb']
+    assert sorted(usage.index) == ['U1', 'U2']
+    assert usage['U1'] == 15
+    assert np.isnan(usage['U2'])
+    
+    # Rows missing part of the key are never paired with each other
+    sides = unmatched.groupby('unmatched_side')['anomaly_reason'].apply(sorted).to_dict()
+    assert sides == {
+        'billing': [
+            "Unmatched billing record (missing user_id or billing_cycle)",
+            "Unmatched billing record (missing user_id or billing_cycle)",
+            "Unmatched billing record (no usage for this user and cycle)"
+        ],
+        'usage': [
+            "Unmatched usage record (missing user_id or billing_cycle)",
+            "Unmatched usage record (missing user_id or billing_cycle)",
+            "Unmatched usage record (no bill for this user and cycle)"
+        ]
+    }
\ No newline at end of file
@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from utils.rule_engine import RuleSet
+from utils.anomaly_detector import AnomalyDetector
+from utils.threshold_explorer import ThresholdExplorer
+
+def make_data(n=2000, seed=0):
+    """Random billing rows, rounded so that many values tie with the default thresholds"""
+    rng = np.random.default_rng(seed)
+    expected = rng.choice([200.0, 499.0, 500.0, 800.0, 1000.0, 1500.0], n)
+    diff = rng.choice([-300.0, -100.0, -99.0, 0.0, 100.0, 300.0, 301.0, 700.0], n)
+    return pd.DataFrame({
+        'user_id': [f"USER_{i:05d}" for i in range(n)],
+        'billed_amount': expected + diff,
+        'expected_amount': expected,
+        'data_usage_mb': rng.choice([0.0, 5000.0, 10000.0, 10001.0, 15000.0], n),
+        'expected_vs_actual_diff': diff
+    })
+
+def reference_anomalies(data, threshold=1200):
+    """The original row-by-row detector: reason and severity per flagged row label"""
+    found = {}
+    for label, row in data.iterrows():
+        reasons = []
+        if row['billed_amount'] > threshold:
+            reasons.append(f"High bill (>${row['billed_amount']:.2f} > ${threshold})")
+        if abs(row['expected_vs_actual_diff']) > 300:
+            reasons.append(f"Large difference (${abs(row['expected_vs_actual_diff']):.2f})")
+        if row['data_usage_mb'] > 10000 and row['expected_amount'] < 500:
+            reasons.append("High data usage with low expected bill")
+        if row['expected_vs_actual_diff'] < -100 and row['billed_amount'] > 800:
+            reasons.append("Billed less than expected despite high usage")
+        
+        if reasons:
+            severity = 0
+            if row['billed_amount'] > threshold:
+                severity += (row['billed_amount'] - threshold) / 100
+            severity += abs(row['expected_vs_actual_diff']) / 100
+            severity += len(reasons) * 0.5
+            found[label] = ("; ".join(reasons), round(severity, 2))
+    return found
+
+def rule_spec(*whens, **thresholds):
+    """A rule set with one rule per expression"""
+    return {
+        'thresholds': {name: {'default': value} for name, value in thresholds.items()},
+        'rules': [{'name': f"rule_{i}", 'when': when} for i, when in enumerate(whens)]
+    }
+
+@pytest.mark.parametrize('when', [
+    "billed_amount ** 2 > 1",
+    "__import__('os').system('true') > 0",
+    "billed_amount.real > 1",
+    "open('rules.json') > 1",
+    "max(billed_amount) > 1",
+    "abs(x=billed_amount) > 1",
+    "billed_amount if data_usage_mb else 0",
+    "billed_amount > 1 and 5",
+    "abs(billed_amount)",
+    "billed_amount >"
+])
+def test_rejects_unsupported_expressions(when):
+    with pytest.raises(ValueError):
+        RuleSet(rule_spec(when))
+
+@pytest.mark.parametrize('spec', [
+    {'rules': []},
+    {'rules': [{'name': 'a'}]},
+    {'rules': [{'name': 'a', 'when': "billed_amount > 1"}, {'name': 'a', 'when': "billed_amount > 2"}]},
+    {'thresholds': {'t': {'default': 'high'}}, 'rules': [{'name': 'a', 'when': "billed_amount > t"}]},
+    {'thresholds': {'t': {'default': 1}}, 'columns': {'t': "billed_amount"}, 'rules': [{'name': 'a', 'when': "t > 1"}]},
+    {'rules': [{'name': f"rule_{i}", 'when': "billed_amount > 1"} for i in range(RuleSet.MAX_RULES + 1)]},
+    {'rules': [{'name': 'a', 'when': "billed_amount > 1"}], 'severity': "billed_amount > 1"}
+])
+def test_rejects_invalid_rule_sets(spec):
+    with pytest.raises(ValueError):
+        RuleSet(spec)
+
+def test_shared_subexpressions_are_computed_once():
+    rule_set = RuleSet({
+        'thresholds': {'t': {'default': 300}, 'u': {'default': 1000}},
+        'columns': {'abs_diff': "abs(expected_vs_actual_diff)"},
+        'rules': [
+            {'name': 'a', 'when': "abs_diff > t"},
+            {'name': 'b', 'when': "abs(expected_vs_actual_diff) > t and billed_amount > u"},
+            {'name': 'c', 'when': "u < billed_amount or abs_diff / 2 > t"}
+        ]
+    })
+    ops = [op for op, _, _ in rule_set._plan((0, 1, 2))['instructions']]
+    
+    # abs(...), abs(...) > t and billed_amount > u (also written u < billed_amount) are one step each
+    assert ops.count('abs') == 1
+    assert ops.count('>') == 3
+    assert ops.count('store') == 3
+    
+    data = make_data()
+    masks = rule_set.evaluate(data, rule_set.defaults)
+    abs_diff = data['expected_vs_actual_diff'].abs()
+    assert np.array_equal(masks['a'], abs_diff > 300)
+    assert np.array_equal(masks['b'], (abs_diff > 300) & (data['billed_amount'] > 1000))
+    assert np.array_equal(masks['c'], (data['billed_amount'] > 1000) | (abs_diff / 2 > 300))
+
+def test_explorer_handles_inclusive_comparisons():
+    detector = AnomalyDetector(RuleSet(rule_spec(
+        "billed_amount >= high", "data_usage_mb <= low and expected_amount >= 800", high=1200, low=5000
+    )))
+    data = make_data()
+    explorer = ThresholdExplorer(data, detector)
+    
+    # Sweep through values that tie with the data, where > and >= (or < and <=) differ
+    for param, values in [('high', np.unique(data['billed_amount'])), ('low', np.unique(data['data_usage_mb']))]:
+        thresholds = detector.get_thresholds()
+        expected = []
+        for value in values:
+            candidate = {**thresholds, param: value}
+            masks = detector.evaluate_rules(data, candidate)
+            expected.append(int(np.logical_or.reduce(list(masks.values())).sum()))
+            assert explorer.count_anomalies(candidate)['total'] == expected[-1]
+        
+        sweep = explorer.sweep(param, values, thresholds)
+        assert sweep['anomaly_count'].tolist() == expected
+
+def test_default_rules_match_reference_detector():
+    data = make_data(500)
+    detector = AnomalyDetector()
+    anomalies = detector.detect_anomalies(data)
+    reference = reference_anomalies(data)
+    
+    assert sorted(anomalies.index) == sorted(reference)
+    for label, row in anomalies.iterrows():
+        assert (row['anomaly_reason'], row['anomaly_severity']) == reference[label]
+    
+    # The what-if path gives the same report once its reasons are filled in
+    explorer = ThresholdExplorer(data, detector)
+    thresholds = {**detector.get_thresholds(), 'threshold': 1000}
+    whatif = detector.describe_anomalies(explorer.anomalies(thresholds), thresholds)
+    expected = AnomalyDetector(threshold=1000).detect_anomalies(data)
+    pd.testing.assert_frame_equal(whatif, expected)
+    
+    reference = reference_anomalies(data, threshold=1000)
+    assert sorted(whatif.index) == sorted(reference)
+    assert whatif['anomaly_severity'].tolist() == [reference[label][1] for label in whatif.index]
\ No newline at end of file
@@ -1,64 +1,186 @@
+import string
+
 import pandas as pd
 import numpy as np
 
+from utils.rule_engine import RuleSet
+
 class AnomalyDetector:
     """Detect anomalies in billing data"""
     
-    def __init__(self, threshold=1200):
-        self.threshold = threshold
+    # Business rules as a rule set (see RuleSet for the format): a rule fires when its
+    # expression holds. Other rule sets can be loaded with RuleSet.from_file.
+    DEFAULT_RULES = {
+        'thresholds': {
+            'threshold': {'default': 1200, 'label': "High bill above ($)"},
+            'diff_threshold': {'default': 300, 'label': "Large difference above ($)"},
+            'high_usage_mb': {'default': 10000, 'label': "High data usage above (MB)"},
+            'low_expected_amount': {'default': 500, 'label': "...with expected bill below ($)"},
+            'underbilled_diff': {'default': -100, 'label': "Underbilled difference below ($)"},
+            'underbilled_min_amount': {'default': 800, 'label': "...with billed amount above ($)"}
+        },
+        'columns': {
+            'abs_diff': "abs(expected_vs_actual_diff)"
+        },
+        'rules': [
+            {
+                'name': 'high_bill',
+                'when': "billed_amount > threshold",
+                'reason': "High bill (>${billed_amount:.2f} > ${threshold})"
+            },
+            {
+                'name': 'large_difference',
+                'when': "abs_diff > diff_threshold",
+                'reason': "Large difference (${abs_diff:.2f})"
+            },
+            {
+                'name': 'usage_mismatch',
+                'when': "data_usage_mb > high_usage_mb and expected_amount < low_expected_amount",
+                'reason': "High data usage with low expected bill"
+            },
+            {
+                'name': 'underbilled',
+                'when': "expected_vs_actual_diff < underbilled_diff and billed_amount > underbilled_min_amount",
+                'reason': "Billed less than expected despite high usage"
+            }
+        ],
+        'severity': "max(billed_amount - threshold, 0) / 100 + abs_diff / 100"
+    }
+    
+    def __init__(self, rule_set=None, **thresholds):
+        self.rule_set = rule_set or RuleSet(self.DEFAULT_RULES)
+        self.rules = self.rule_set.rules
+        
+        # Labels for the adjustable thresholds, in the order they are shown in the sidebar
+        self.threshold_labels = self.rule_set.labels
+        
+        unknown = [name for name in thresholds if name not in self.rule_set.defaults]
+        if unknown:
+            raise ValueError(f"Unknown thresholds: {', '.join(unknown)}")
+        self.thresholds = {**self.rule_set.defaults, **thresholds}
+    
+    def get_thresholds(self):
+        """Get the current value of every rule threshold"""
+        return dict(self.thresholds)
+    
+    def rule_column(self, data, column):
+        """Get the values of a data column or derived rule column as a float array"""
+        return self.rule_set.column_values(data, column)
+    
+    def evaluate_rules(self, data, thresholds=None, rule_names=None):
+        """Evaluate the rules (all of them by default) over the whole dataset, returning a boolean mask per rule"""
+        return self.rule_set.evaluate(data, thresholds or self.get_thresholds(), rule_names)
     
     def detect_anomalies(self, data):
         """Detect anomalies based on business rules"""
-        anomalies = []
-        
-        for _, row in data.iterrows():
-            anomaly_reasons = []
-            
-            # Rule 1: Billed amount > threshold
-            if row['billed_amount'] > self.threshold:
-                anomaly_reasons.append(f"High bill (>${row['billed_amount']:.2f} > ${self.threshold})")
-            
-            # Rule 2: Significant difference between expected and actual
-            if abs(row['expected_vs_actual_diff']) > 300:
-                anomaly_reasons.append(f"Large difference (${abs(row['expected_vs_actual_diff']):.2f})")
-            
-            # Rule 3: Very high data usage with low expected amount
-            if row['data_usage_mb'] > 10000 and row['expected_amount'] < 500:
-                anomaly_reasons.append("High data usage with low expected bill")
-            
-            # Rule 4: Negative difference but high bill (potential billing error)
-            if row['expected_vs_actual_diff'] < -100 and row['billed_amount'] > 800:
-                anomaly_reasons.append("Billed less than expected despite high usage")
-            
-            if anomaly_reasons:
-                anomaly_record = row.copy()
-                anomaly_record['anomaly_reason'] = "; ".join(anomaly_reasons)
-                anomaly_record['anomaly_severity'] = self._calculate_severity(row, anomaly_reasons)
-                anomalies.append(anomaly_record)
-        
-        if anomalies:
-            anomaly_df = pd.DataFrame(anomalies)
-            # Sort by severity (highest first)
-            anomaly_df = anomaly_df.sort_values('anomaly_severity', ascending=False)
-            return anomaly_df
-        else:
-            return pd.DataFrame()
-    
-    def _calculate_severity(self, row, reasons):
-        """Calculate anomaly severity score"""
-        severity = 0
+        masks = self.evaluate_rules(data)
+        return self.build_anomalies(data, masks)
+    
+    def build_anomalies(self, data, masks, thresholds=None, reasons=True):
+        """Build the anomaly report for the rows flagged by the given rule masks"""
+        # With reasons=False the reason text is left as None for describe_anomalies to fill in later,
+        # so callers that only show a few rows (the what-if path) don't format one string per anomaly
+        thresholds = thresholds or self.get_thresholds()
+        
+        flagged = np.zeros(len(data), dtype=bool)
+        for mask in masks.values():
+            flagged |= mask
         
-        # Base severity on amount difference
-        if row['billed_amount'] > self.threshold:
-            severity += (row['billed_amount'] - self.threshold) / 100
+        anomaly_df = data.take(np.flatnonzero(flagged))
         
-        # Add severity for large differences
-        severity += abs(row['expected_vs_actual_diff']) / 100
+        # Bit i of the rule bits is rule i
+        rule_counts = np.zeros(len(anomaly_df))
+        rule_bits = np.zeros(len(anomaly_df), dtype=np.uint64)
+        for bit, rule in enumerate(self.rules):
+            fired = masks[rule['name']][flagged]
+            rule_counts += fired
+            rule_bits |= fired.astype(np.uint64) << np.uint64(bit)
+        
+        anomaly_df['anomaly_reason'] = self._reasons(anomaly_df, rule_bits, thresholds) if reasons else None
+        anomaly_df['anomaly_rules'] = rule_bits
+        anomaly_df['anomaly_severity'] = self._calculate_severity(anomaly_df, rule_counts, thresholds)
+        
+        # Rows stay in data order; use top_anomalies() or sort_anomalies() for severity order
+        return anomaly_df
+    
+    def describe_anomalies(self, anomalies, thresholds=None):
+        """Fill in the reasons of anomalies built without them, e.g. just the rows about to be shown"""
+        missing = anomalies['anomaly_reason'].isna().to_numpy()
+        if not missing.any():
+            return anomalies
+        
+        rows = anomalies[missing]
+        reasons = anomalies['anomaly_reason'].to_numpy(dtype=object, copy=True)
+        reasons[missing] = self._reasons(
+            rows, rows['anomaly_rules'].to_numpy(), thresholds or self.get_thresholds()
+        ).to_numpy()
+        return anomalies.assign(anomaly_reason=reasons)
+    
+    def sort_anomalies(self, anomalies):
+        """Sort every anomaly by severity (highest first), e.g. for a full export"""
+        return anomalies.sort_values('anomaly_severity', ascending=False, kind='stable')
+    
+    def top_anomalies(self, anomalies, k):
+        """Get the k most severe anomalies (highest first) without sorting the rest"""
+        if k >= len(anomalies):
+            return self.sort_anomalies(anomalies)
+        if k <= 0:
+            return anomalies.iloc[0:0]
+        
+        severity = anomalies['anomaly_severity'].to_numpy(dtype=float)
+        top = _top_positions(severity, k)
+        
+        # Only the k selected rows are sorted
+        top = top[np.lexsort((top, -severity[top]))]
+        return anomalies.iloc[top]
+    
+    def severity_order(self, anomalies):
+        """Get the positions of every anomaly in severity order (highest first), ties in row order"""
+        severity = anomalies['anomaly_severity'].to_numpy(dtype=float)
+        return np.argsort(-severity, kind='stable')
+    
+    def page_anomalies(self, anomalies, page, page_size, order=None):
+        """Get one page of anomalies in severity order"""
+        # Without a precomputed severity_order, only the rows up to this page are sorted
+        if order is not None:
+            return anomalies.iloc[order[page * page_size:(page + 1) * page_size]]
+        return self.top_anomalies(anomalies, (page + 1) * page_size).iloc[page * page_size:]
+    
+    def _reasons(self, rows, rule_bits, thresholds):
+        """Join the reasons of every rule that fired on each row, in rule order"""
+        reasons = pd.Series('', index=rows.index, dtype=object)
+        for bit, rule in enumerate(self.rules):
+            fired = (rule_bits >> np.uint64(bit)) & np.uint64(1) == 1
+            if fired.any():
+                reasons[fired] += '; ' + self._format_reason(rule['reason'], rows[fired], thresholds)
+        return reasons.str[2:]
+    
+    def _format_reason(self, template, rows, thresholds):
+        """Render a rule's reason template for each of the given rows"""
+        fields = {field for _, field, _, _ in string.Formatter().parse(template) if field}
+        column_fields = [field for field in fields if field not in thresholds]
+        
+        if not column_fields:
+            return pd.Series(template.format(**thresholds), index=rows.index)
+        
+        values = [self.rule_column(rows, field) for field in column_fields]
+        return pd.Series([
+            template.format(**thresholds, **dict(zip(column_fields, row_values)))
+            for row_values in zip(*values)
+        ], index=rows.index)
+    
+    def _calculate_severity(self, rows, rule_counts, thresholds):
+        """Calculate anomaly severity score"""
+        severity = np.zeros(len(rows))
+        
+        # Base severity from the rule set, e.g. how far the bill is over the threshold
+        if self.rule_set.severity is not None:
+            severity += self.rule_set.evaluate_node(rows, self.rule_set.severity, thresholds)
         
         # Add severity for multiple reasons
-        severity += len(reasons) * 0.5
+        severity += rule_counts * 0.5
         
-        return round(severity, 2)
+        return np.round(severity, 2)
     
     def get_anomaly_stats(self, anomalies):
         """Get statistics about detected anomalies"""
@@ -78,4 +200,13 @@ class AnomalyDetector:
             'avg_severity': anomalies['anomaly_severity'].mean()
         }
         
-        return stats
\ No newline at end of file
+        return stats
+
+def _top_positions(severity, k):
+    """Positions of the k largest severities in linear time, ties going to earlier rows"""
+    cutoff_position = len(severity) - k
+    cutoff = severity[np.argpartition(severity, cutoff_position)[cutoff_position]]
+    
+    above = np.flatnonzero(severity > cutoff)
+    ties = np.flatnonzero(severity == cutoff)[:k - len(above)]
+    return np.concatenate([above, ties])
\ No newline at end of file
@@ -0,0 +1,212 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.data_processor import DataProcessor
+from utils.pipeline import analyze_dataset, preview_dataset
+from utils.reconciler import Reconciler
+from utils.sampler import StratifiedReservoirSampler
+
+class ProcessingJob:
+    """Progress and result of one dataset being processed in the background"""
+    
+    def __init__(self, dataset_id, total_bytes, rate_plans=None, rule_set=None, source=None, label=None):
+        self.dataset_id = dataset_id
+        self.source = source
+        self.label = label
+        self.total_bytes = total_bytes
+        self.rate_plans = rate_plans
+        self.rule_set = rule_set
+        self.status = 'running'
+        self.data = None
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        
+        # Stratified sample drawn during the read, for approximate results before the exact ones
+        self.sampler = StratifiedReservoirSampler()
+        self.coverage = 0.0
+        self._preview = None
+        
+        self._lock = threading.Lock()
+        self._stage = "Queued"
+        self._done = 0
+        self._total = 0
+        self._rows = 0
+        self._stage_started = time.monotonic()
+    
+    def update(self, stage, done, total, rows=None):
+        """Record progress within a stage; called from the worker thread"""
+        # done/total are in the stage's own unit (bytes while reading, rows afterwards)
+        with self._lock:
+            if stage != self._stage:
+                self._stage = stage
+                self._stage_started = time.monotonic()
+            self._done = done
+            self._total = total
+            self._rows = done if rows is None else rows
+    
+    def finish(self, data=None, result=None, error=None):
+        """Mark the job as done or failed"""
+        with self._lock:
+            self.data = data
+            self.result = result
+            self.error = error
+            self.status = 'failed' if error is not None else 'done'
+            self.finished_at = time.monotonic()
+    
+    def preview(self):
+        """Approximate results from the sample drawn so far, or None before the first chunk"""
+        rows_seen = self.sampler.rows_seen
+        if self._preview is not None and self._preview[0] == rows_seen:
+            return self._preview[1]
+        
+        sample, counts = self.sampler.sample()
+        if sample is None:
+            return None
+        
+        preview = preview_dataset(
+            sample, counts, coverage=self.coverage, rate_plans=self.rate_plans, rule_set=self.rule_set
+        )
+        self._preview = (rows_seen, preview)
+        return preview
+    
+    def progress(self):
+        """Snapshot of the current stage with throughput and ETA"""
+        with self._lock:
+            elapsed = time.monotonic() - self._stage_started
+            fraction = self._done / self._total if self._total else 0.0
+            
+            # Extrapolate the rest of the stage from its rate so far
+            eta = None
+            if 0 < fraction < 1 and elapsed > 0:
+                eta = elapsed * (1 - fraction) / fraction
+            
+            return {
+                'stage': self._stage,
+                'fraction': min(fraction, 1.0),
+                'rows': self._rows,
+                'rows_per_sec': self._rows / elapsed if elapsed > 0 and self._rows else None,
+                'eta_seconds': eta
+            }
+
+class BackgroundProcessor:
+    """Run ingestion and anomaly detection on a worker pool, one job per dataset"""
+    
+    def __init__(self, max_workers=None, chunk_size=100_000, keep_finished_seconds=3600, fingerprints=None):
+        # max_workers=None sizes the pool from the CPU count, like ThreadPoolExecutor does
+        self.chunk_size = chunk_size
+        self.keep_finished_seconds = keep_finished_seconds
+        self.fingerprints = fingerprints
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='billing-worker')
+        self._jobs = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, dataset_id, csv_bytes, rate_plans=None, rule_set=None, source=None, label=None):
+        """Start processing a CSV upload, or return the job already running for it"""
+        # source names the data feed whose earlier runs the anomalies are compared with, and
+        # label (e.g. the file name) describes this run of it
+        return self._start(dataset_id, len(csv_bytes), rate_plans, rule_set, source, label, self._run, csv_bytes)
+    
+    def submit_reconciliation(self, dataset_id, billing_bytes, usage_bytes, rate_plans=None, rule_set=None,
+                              source=None, label=None):
+        """Start joining separate billing and usage uploads, or return the job already running for them"""
+        return self._start(
+            dataset_id, len(billing_bytes) + len(usage_bytes), rate_plans, rule_set, source, label,
+            self._run_reconciliation, billing_bytes, usage_bytes
+        )
+    
+    def _start(self, dataset_id, total_bytes, rate_plans, rule_set, source, label, run, *inputs):
+        """Register a job and hand it to the pool"""
+        with self._lock:
+            self._purge_finished()
+            
+            # Reruns of the same upload reattach to the running job instead of restarting it
+            if dataset_id in self._jobs:
+                return self._jobs[dataset_id]
+            
+            job = ProcessingJob(dataset_id, total_bytes, rate_plans, rule_set, source, label)
+            self._jobs[dataset_id] = job
+        
+        self._executor.submit(run, job, *inputs)
+        return job
+    
+    def get(self, dataset_id):
+        """Get the job for a dataset, if any"""
+        with self._lock:
+            return self._jobs.get(dataset_id)
+    
+    def discard(self, dataset_id):
+        """Forget a job once its result has been attached to a session"""
+        with self._lock:
+            self._jobs.pop(dataset_id, None)
+    
+    def _purge_finished(self):
+        """Drop finished jobs nobody came back for"""
+        now = time.monotonic()
+        expired = [
+            dataset_id for dataset_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.keep_finished_seconds
+        ]
+        for dataset_id in expired:
+            del self._jobs[dataset_id]
+    
+    def _run(self, job, csv_bytes):
+        """Read the upload in chunks, then process and detect, reporting progress on the job"""
+        try:
+            source = io.BytesIO(csv_bytes)
+            processor = DataProcessor(job.rate_plans)
+            chunks = []
+            rows = 0
+            
+            for chunk in pd.read_csv(source, chunksize=self.chunk_size):
+                # Fail fast on the first chunk instead of after reading the whole file
+                if not chunks:
+                    missing_columns = processor.find_missing_columns(chunk.columns)
+                    if missing_columns:
+                        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+                
+                chunks.append(chunk)
+                job.sampler.add(chunk)
+                rows += len(chunk)
+                job.coverage = source.tell() / job.total_bytes if job.total_bytes else 1.0
+                job.update("Reading file", source.tell(), job.total_bytes, rows=rows)
+            
+            data = pd.concat(chunks, ignore_index=True)
+            result = analyze_dataset(
+                data, job.dataset_id, chunk_size=self.chunk_size, on_progress=job.update, rate_plans=job.rate_plans,
+                fingerprints=self.fingerprints, rule_set=job.rule_set, source=job.source, label=job.label
+            )
+            job.finish(data=data, result=result)
+            
+        except Exception as e:
+            job.finish(error=e)
+    
+    def _run_reconciliation(self, job, billing_bytes, usage_bytes):
+        """Hash join the billing and usage uploads, then process and detect the joined rows"""
+        try:
+            reconciler = Reconciler(chunk_size=self.chunk_size)
+            partitions_done = [0]
+            
+            def on_partition(joined):
+                # Partitions hold disjoint random slices of the keys, so the sample stays representative
+                partitions_done[0] += 1
+                job.sampler.add(joined)
+                job.coverage = partitions_done[0] / reconciler.partitions
+            
+            data, unmatched = reconciler.reconcile(
+                io.BytesIO(billing_bytes), io.BytesIO(usage_bytes),
+                on_progress=job.update, on_partition=on_partition
+            )
+            result = analyze_dataset(
+                data, job.dataset_id, chunk_size=self.chunk_size, on_progress=job.update,
+                rate_plans=job.rate_plans, unmatched=unmatched, fingerprints=self.fingerprints,
+                rule_set=job.rule_set, source=job.source, label=job.label
+            )
+            job.finish(data=data, result=result)
+            
+        except Exception as e:
+            job.finish(error=e)
\ No newline at end of file
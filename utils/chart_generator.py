@@ -1,12 +1,17 @@
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 
+from utils.data_processor import DataProcessor
+
+# plotly is imported inside each chart method, so importing this module (and
+# every page that draws no charts) does not pay for loading it
+
 class ChartGenerator:
     """Generate charts for the dashboard"""
     
-    def __init__(self):
+    def __init__(self, cache=None):
+        # Optional FigureCache; charts given a data version are then built once per version
+        self.cache = cache
         self.color_palette = {
             'primary': '#3B82F6',
             'secondary': '#10B981',
@@ -16,16 +21,71 @@ class ChartGenerator:
             'anomaly': '#EF4444'
         }
     
-    def create_billing_trend_chart(self, data):
+    def _approximate_suffix(self, data):
+        """Title suffix marking charts drawn from a weighted sample"""
+        return ' (approximate)' if 'sample_weight' in data.columns else ''
+    
+    def _memoize(self, chart, version, build):
+        """Build a figure, or get it from the cache if this chart of this data version was built before"""
+        # Cached figures are shared by every session, so callers must not modify them
+        if self.cache is None or version is None:
+            return build()
+        
+        key = (chart, version)
+        fig = self.cache.get(key)
+        if fig is not None:
+            return fig
+        
+        fig = build()
+        self.cache.put(key, fig, self._figure_size(fig.to_dict()))
+        return fig
+    
+    def _figure_size(self, value):
+        """Rough size in bytes of a figure's data, counting the arrays and strings it holds"""
+        if isinstance(value, np.ndarray):
+            if value.dtype == object:
+                return sum(self._figure_size(item) for item in value.ravel())
+            return value.nbytes
+        if isinstance(value, dict):
+            return sum(len(key) + self._figure_size(item) for key, item in value.items())
+        if isinstance(value, (list, tuple)):
+            return sum(self._figure_size(item) for item in value) + 8 * len(value)
+        if isinstance(value, str):
+            return len(value)
+        return 8
+    
+    def create_billing_trend_chart(self, data, version=None):
         """Create a line chart showing billing trends over time"""
+        # version identifies the data (e.g. the dataset id); charts with a version are memoized
+        return self._memoize('billing_trend', version, lambda: self._build_billing_trend_chart(data))
+    
+    def _build_billing_trend_chart(self, data):
+        """Build the billing trend line chart"""
+        import plotly.graph_objects as go
+        
         # Group by billing cycle and calculate average
-        trend_data = data.groupby('billing_cycle').agg({
-            'billed_amount': ['mean', 'count'],
-            'expected_amount': 'mean'
-        }).round(2)
+        if 'sample_weight' in data.columns:
+            # Sampled rows stand for sample_weight records each
+            weights = data['sample_weight']
+            totals = data.assign(
+                billed_total=data['billed_amount'] * weights,
+                expected_total=data['expected_amount'] * weights
+            ).groupby('billing_cycle')[['sample_weight', 'billed_total', 'expected_total']].sum()
+            
+            trend_data = pd.DataFrame({
+                'avg_billed': totals['billed_total'] / totals['sample_weight'],
+                'record_count': totals['sample_weight'],
+                'avg_expected': totals['expected_total'] / totals['sample_weight']
+            }).round(2)
+        else:
+            trend_data = data.groupby('billing_cycle').agg({
+                'billed_amount': ['mean', 'count'],
+                'expected_amount': 'mean'
+            }).round(2)
+            
+            # Flatten column names
+            trend_data.columns = ['avg_billed', 'record_count', 'avg_expected']
         
-        # Flatten column names
-        trend_data.columns = ['avg_billed', 'record_count', 'avg_expected']
         trend_data = trend_data.reset_index()
         
         # Create line chart
@@ -52,7 +112,7 @@ class ChartGenerator:
         ))
         
         fig.update_layout(
-            title='Billing Amount Trends Over Time',
+            title='Billing Amount Trends Over Time' + self._approximate_suffix(data),
             xaxis_title='Billing Cycle',
             yaxis_title='Amount ($)',
             hovermode='x unified',
@@ -62,10 +122,21 @@ class ChartGenerator:
         
         return fig
     
-    def create_anomaly_pie_chart(self, data, anomalies):
+    def create_anomaly_pie_chart(self, data, anomalies, version=None):
         """Create a pie chart showing normal vs anomalous bills"""
-        normal_count = len(data) - len(anomalies)
-        anomaly_count = len(anomalies)
+        # version must identify both the data and the thresholds the anomalies came from
+        return self._memoize('anomaly_pie', version, lambda: self._build_anomaly_pie_chart(data, anomalies))
+    
+    def _build_anomaly_pie_chart(self, data, anomalies):
+        """Build the normal vs anomalous pie chart"""
+        import plotly.graph_objects as go
+        
+        if 'sample_weight' in data.columns:
+            normal_count = round(data['sample_weight'].sum() - anomalies['sample_weight'].sum())
+            anomaly_count = round(anomalies['sample_weight'].sum())
+        else:
+            normal_count = len(data) - len(anomalies)
+            anomaly_count = len(anomalies)
         
         labels = ['Normal Bills', 'Anomalous Bills']
         values = [normal_count, anomaly_count]
@@ -81,7 +152,7 @@ class ChartGenerator:
         )])
         
         fig.update_layout(
-            title='Distribution of Normal vs Anomalous Bills',
+            title='Distribution of Normal vs Anomalous Bills' + self._approximate_suffix(data),
             template='plotly_white',
             height=400,
             showlegend=True
@@ -91,10 +162,12 @@ class ChartGenerator:
     
     def create_amount_distribution_chart(self, data, anomalies):
         """Create a histogram showing distribution of billing amounts"""
+        import plotly.graph_objects as go
+        
         fig = go.Figure()
         
         # Add normal bills
-        normal_data = data[~data['user_id'].isin(anomalies['user_id'])]
+        normal_data = data[~DataProcessor.users_in(data, anomalies)]
         fig.add_trace(go.Histogram(
             x=normal_data['billed_amount'],
             name='Normal Bills',
@@ -126,8 +199,10 @@ class ChartGenerator:
     
     def create_data_usage_vs_billing_chart(self, data, anomalies):
         """Create a scatter plot of data usage vs billing amount"""
+        import plotly.graph_objects as go
+        
         # Separate normal and anomalous data
-        normal_data = data[~data['user_id'].isin(anomalies['user_id'])]
+        normal_data = data[~DataProcessor.users_in(data, anomalies)]
         
         fig = go.Figure()
         
@@ -171,4 +246,36 @@ class ChartGenerator:
             height=400
         )
         
+        return fig
+    
+    def create_threshold_sweep_chart(self, sweep_data, current_value, label):
+        """Create a step chart of anomaly count against a rule threshold"""
+        import plotly.graph_objects as go
+        
+        fig = go.Figure()
+        
+        fig.add_trace(go.Scatter(
+            x=sweep_data['threshold'],
+            y=sweep_data['anomaly_count'],
+            mode='lines',
+            name='Anomalies',
+            line=dict(color=self.color_palette['primary'], width=3, shape='hv')
+        ))
+        
+        # Mark the threshold currently selected in the sidebar
+        fig.add_vline(
+            x=current_value,
+            line_dash='dash',
+            line_color=self.color_palette['warning'],
+            annotation_text='Current'
+        )
+        
+        fig.update_layout(
+            title=f'Anomaly Count vs {label}',
+            xaxis_title=label,
+            yaxis_title='Anomalies',
+            template='plotly_white',
+            height=400
+        )
+        
         return fig
\ No newline at end of file
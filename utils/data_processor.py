@@ -4,15 +4,29 @@ import numpy as np
 class DataProcessor:
     """Handle data processing and validation"""
     
-    def __init__(self):
+    def __init__(self, rate_plans=None):
         self.required_columns = [
             'user_id', 'billed_amount', 'expected_amount', 
             'data_usage_mb', 'expected_vs_actual_diff'
         ]
+        self.rate_plans = rate_plans
+        
+        # Bills the rate plans could not price in the last process_data call, each with its reason
+        self.unrated = None
+    
+    def find_missing_columns(self, columns):
+        """List the required columns that a dataset with these columns lacks"""
+        required_columns = self.required_columns
+        
+        # With rate plans loaded, expected amounts are computed from plan_id and usage instead
+        if self.rate_plans is not None and 'plan_id' in columns:
+            required_columns = [col for col in required_columns if col not in ('expected_amount', 'expected_vs_actual_diff')]
+        
+        return [col for col in required_columns if col not in columns]
     
     def validate_data(self, data):
         """Validate that the data has required columns and proper format"""
-        missing_columns = [col for col in self.required_columns if col not in data.columns]
+        missing_columns = self.find_missing_columns(data.columns)
         
         if missing_columns:
             raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
@@ -20,7 +34,7 @@ class DataProcessor:
         # Check for numeric columns
         numeric_columns = ['billed_amount', 'expected_amount', 'data_usage_mb', 'expected_vs_actual_diff']
         for col in numeric_columns:
-            if not pd.api.types.is_numeric_dtype(data[col]):
+            if col in data.columns and not pd.api.types.is_numeric_dtype(data[col]):
                 try:
                     data[col] = pd.to_numeric(data[col], errors='coerce')
                 except:
@@ -33,6 +47,16 @@ class DataProcessor:
         # Validate data first
         data = self.validate_data(data)
         
+        # Rate usage against the plan tables to get the expected bill; bills that cannot be rated
+        # (unknown plan, no usage) are set aside with a reason instead of being dropped as incomplete
+        self.unrated = None
+        if self.rate_plans is not None and 'plan_id' in data.columns:
+            data = self.rate_plans.apply(data)
+            unrated = data['expected_amount'].isna() & data['user_id'].notna() & data['billed_amount'].notna()
+            if unrated.any():
+                self.unrated = data[unrated].assign(anomaly_reason=self.rate_plans.unrated_reasons(data[unrated]))
+                data = data[~unrated]
+        
         # Remove any rows with missing critical data
         data = data.dropna(subset=['user_id', 'billed_amount', 'expected_amount'])
         
@@ -43,15 +67,37 @@ class DataProcessor:
         # Calculate difference if not provided correctly
         data['expected_vs_actual_diff'] = data['billed_amount'] - data['expected_amount']
         
-        # Add billing cycle (dummy data for demonstration)
-        np.random.seed(42)
-        data['billing_cycle'] = np.random.choice(
-            ['2024-01', '2024-02', '2024-03', '2024-04'], 
-            size=len(data)
-        )
+        # Add billing cycle if the file has none (dummy data for demonstration)
+        if 'billing_cycle' not in data.columns:
+            data['billing_cycle'] = self.demo_billing_cycles(data.index)
         
         return data
     
+    def encode_user_ids(self, data):
+        """Map each user_id to a dense int32 code, returning the codes and the code -> user_id dictionary"""
+        codes, user_ids = pd.factorize(data['user_id'])
+        return codes.astype(np.int32), np.asarray(user_ids)
+    
+    @staticmethod
+    def demo_billing_cycles(index):
+        """Demo billing cycle per row label, the same whichever chunk or sample the row is processed in"""
+        cycles = np.array(['2024-01', '2024-02', '2024-03', '2024-04'], dtype=object)
+        return cycles[pd.util.hash_pandas_object(index).to_numpy() % len(cycles)]
+    
+    @staticmethod
+    def users_in(data, others):
+        """Mask of the rows of data whose user also has a row in others"""
+        if 'user_code' not in data.columns or 'user_code' not in others.columns:
+            return data['user_id'].isin(others['user_id']).to_numpy()
+        
+        # Dense codes index straight into a flag per user, so nothing is hashed
+        codes = data['user_code'].to_numpy()
+        other_codes = others['user_code'].to_numpy()
+        user_count = max(codes.max(initial=-1), other_codes.max(initial=-1)) + 1
+        flags = np.zeros(user_count, dtype=bool)
+        flags[other_codes] = True
+        return flags[codes]
+    
     def get_data_summary(self, data):
         """Get summary statistics of the data"""
         summary = {
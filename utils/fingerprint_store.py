@@ -0,0 +1,178 @@
+import os
+import threading
+
+import pandas as pd
+import numpy as np
+
+class FingerprintStore:
+    """Remember the anomalies earlier runs flagged, to tell new ones from recurring and resolved ones"""
+    
+    # An anomaly's fingerprint is a 64-bit hash of (user_id, rule bits, billed amount band).
+    # Each data source (a feed the user names, e.g. one region's monthly files) has its own
+    # history, a sorted array of fingerprints: 8 bytes per entry, so tens of millions fit in a
+    # few hundred MB, and membership is one binary search per anomaly.
+    RUN_COLUMNS = ['user_id', 'anomaly_rules', 'amount_band']
+    
+    # Source of runs that don't name one, and of files written before histories were kept per source
+    DEFAULT_SOURCE = 'default'
+    
+    def __init__(self, path=None, amount_bands=(250, 500, 1000, 1500, 2500)):
+        self.path = path
+        self.amount_bands = np.asarray(amount_bands, dtype=float)
+        self._lock = threading.Lock()
+        
+        # Per source: every fingerprint seen so far, plus the last run's anomalies for working out resolved
+        # ones and its label (e.g. the file names), which is only ever displayed
+        self.histories = {}
+        self.last_runs = {}
+        self.labels = {}
+        
+        if path is not None and os.path.exists(path):
+            self._load()
+    
+    def history(self, source=DEFAULT_SOURCE):
+        """Every fingerprint seen so far from a data source, sorted"""
+        return self.histories.get(source, np.zeros(0, dtype=np.uint64))
+    
+    def last_run(self, source=DEFAULT_SOURCE):
+        """Arrays describing the anomalies of a data source's last run"""
+        if source in self.last_runs:
+            return self.last_runs[source]
+        return self._run_record(np.zeros(0, dtype=np.uint64), [], [], [])
+    
+    def last_label(self, source=DEFAULT_SOURCE):
+        """Label of a data source's last run, if it had one"""
+        return self.labels.get(source)
+    
+    def amount_band(self, anomalies):
+        """Band index of each anomaly's billed amount"""
+        amounts = pd.to_numeric(anomalies['billed_amount'], errors='coerce').to_numpy(dtype=float)
+        return np.searchsorted(self.amount_bands, amounts, side='right').astype(np.int8)
+    
+    def _user_column(self, anomalies, user_ids):
+        """Each anomaly's user_id as text, dictionary-encoded when the user codes are available"""
+        if user_ids is None or 'user_code' not in anomalies.columns:
+            return anomalies['user_id'].astype(str).to_numpy()
+        
+        # Hashing a categorical hashes each distinct user once and gives the same values as hashing every row
+        used_codes, codes = np.unique(anomalies['user_code'].to_numpy(), return_inverse=True)
+        names = pd.unique(user_ids[used_codes].astype(str))
+        if len(names) < len(used_codes):
+            return anomalies['user_id'].astype(str).to_numpy()
+        return pd.Categorical.from_codes(codes, categories=names)
+    
+    def fingerprint(self, anomalies, user_ids=None, rule_bits=None):
+        """64-bit fingerprint of each anomaly; user_ids is the dataset's code -> user_id dictionary, if any"""
+        # rule_bits, if given, replaces the anomaly_rules column, e.g. with the rules that fire at the
+        # thresholds the history was recorded at
+        rule_bits = anomalies['anomaly_rules'] if rule_bits is None else rule_bits
+        keys = pd.DataFrame({
+            'user_id': self._user_column(anomalies, user_ids),
+            'anomaly_rules': np.asarray(rule_bits, dtype=np.uint64),
+            'amount_band': self.amount_band(anomalies)
+        })
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    
+    def contains(self, fingerprints, source=DEFAULT_SOURCE):
+        """Whether each fingerprint is in a data source's history"""
+        history = self.history(source)
+        if len(history) == 0:
+            return np.zeros(len(fingerprints), dtype=bool)
+        
+        # Searching in sorted order walks the history front to back, which keeps it cache friendly
+        order = np.argsort(fingerprints)
+        positions = np.empty(len(fingerprints), dtype=np.int64)
+        positions[order] = np.searchsorted(history, fingerprints[order])
+        positions = np.minimum(positions, len(history) - 1)
+        return history[positions] == fingerprints
+    
+    def split(self, anomalies, user_ids=None, source=DEFAULT_SOURCE, rule_bits=None):
+        """Split anomalies into new and recurring ones, and list the source's last run anomalies that are gone"""
+        fingerprints = self.fingerprint(anomalies, user_ids, rule_bits)
+        seen = self.contains(fingerprints, source)
+        last_run = self.last_run(source)
+        resolved = ~np.isin(last_run['fingerprint'], fingerprints)
+        
+        return {
+            'new': anomalies[~seen],
+            'recurring': anomalies[seen],
+            'resolved': pd.DataFrame({column: last_run[column][resolved] for column in self.RUN_COLUMNS})
+        }
+    
+    def record(self, anomalies, user_ids=None, source=DEFAULT_SOURCE, label=None):
+        """Add a run's anomalies to its source's history, returning the source's history as it was before the run"""
+        fingerprints = self.fingerprint(anomalies, user_ids)
+        additions = np.unique(fingerprints)
+        
+        with self._lock:
+            baseline = FingerprintStore(amount_bands=self.amount_bands)
+            baseline.histories[source] = self.history(source)
+            baseline.last_runs[source] = self.last_run(source)
+            baseline.labels[source] = self.last_label(source)
+            
+            # The history and the additions are both sorted runs, which the stable sort merges in linear time
+            additions = additions[~self.contains(additions, source)]
+            if len(additions):
+                self.histories[source] = np.sort(np.concatenate([self.history(source), additions]), kind='stable')
+            
+            self.last_runs[source] = self._run_record(
+                fingerprints,
+                anomalies['user_id'].astype(str).to_numpy(),
+                anomalies['anomaly_rules'].to_numpy(dtype=np.uint64),
+                self.amount_band(anomalies)
+            )
+            self.labels[source] = label
+            
+            if self.path is not None:
+                self._save()
+        
+        return baseline
+    
+    @staticmethod
+    def _run_record(fingerprints, user_ids, rules, bands):
+        """Arrays describing one run's anomalies"""
+        return {
+            'fingerprint': np.asarray(fingerprints, dtype=np.uint64),
+            'user_id': np.asarray(user_ids, dtype=str),
+            'anomaly_rules': np.asarray(rules, dtype=np.uint64),
+            'amount_band': np.asarray(bands, dtype=np.int8)
+        }
+    
+    def _load(self):
+        """Read every source's history and last run from disk"""
+        with np.load(self.path) as stored:
+            # Files from before histories were kept per source hold a single unprefixed one
+            if 'sources' in stored:
+                prefixes = {str(source): f"{index}_" for index, source in enumerate(stored['sources'])}
+            else:
+                prefixes = {self.DEFAULT_SOURCE: ''}
+            
+            for source, prefix in prefixes.items():
+                self.histories[source] = stored[f'{prefix}history']
+                self.last_runs[source] = self._run_record(
+                    stored[f'{prefix}last_fingerprint'],
+                    stored[f'{prefix}last_user_id'],
+                    stored[f'{prefix}last_anomaly_rules'],
+                    stored[f'{prefix}last_amount_band']
+                )
+                if f'{prefix}last_label' in stored:
+                    self.labels[source] = str(stored[f'{prefix}last_label'])
+    
+    def _save(self):
+        """Write every source's history and last run to disk, replacing the old file in one step"""
+        sources = sorted(set(self.histories) | set(self.last_runs))
+        arrays = {'sources': np.array(sources, dtype=str)}
+        for index, source in enumerate(sources):
+            last_run = self.last_run(source)
+            arrays[f'{index}_history'] = self.history(source)
+            arrays[f'{index}_last_fingerprint'] = last_run['fingerprint']
+            arrays[f'{index}_last_user_id'] = last_run['user_id']
+            arrays[f'{index}_last_anomaly_rules'] = last_run['anomaly_rules']
+            arrays[f'{index}_last_amount_band'] = last_run['amount_band']
+            if self.last_label(source) is not None:
+                arrays[f'{index}_last_label'] = np.array(self.labels[source], dtype=str)
+        
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporary_path, self.path)
\ No newline at end of file
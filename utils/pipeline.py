@@ -0,0 +1,103 @@
+import pandas as pd
+import numpy as np
+
+from utils.data_processor import DataProcessor
+from utils.anomaly_detector import AnomalyDetector
+from utils.threshold_explorer import ThresholdExplorer
+from utils.sampler import estimate_total, estimate_ratio
+
+def analyze_dataset(data, dataset_id, chunk_size=None, on_progress=None, rate_plans=None, unmatched=None,
+                    fingerprints=None, rule_set=None, source=None, label=None):
+    """Process a dataset and detect anomalies, returning the session's processed-data record"""
+    # on_progress, if given, is called as on_progress(stage, done, total) while the work advances;
+    # unmatched holds the records a billing/usage reconciliation could not pair up, and
+    # fingerprints is the FingerprintStore this run's anomalies are recorded in, under source (the
+    # data feed the user picked; the dataset id by default) with label (e.g. the upload's file name)
+    # describing the run, and rule_set replaces the default anomaly rules
+    processor = DataProcessor(rate_plans)
+    detector = AnomalyDetector(rule_set)
+    source = source or dataset_id
+    
+    if on_progress:
+        on_progress("Cleaning data", 0, len(data))
+    processed_data = processor.process_data(data)
+    
+    # Dictionary-encode user ids once; lookups and membership tests then work on the int32 codes
+    processed_data['user_code'], user_ids = processor.encode_user_ids(processed_data)
+    
+    # The rules only look at one row at a time, so detection can run chunk by chunk
+    total_rows = len(processed_data)
+    chunk_size = chunk_size or max(total_rows, 1)
+    anomaly_chunks = []
+    for start in range(0, max(total_rows, 1), chunk_size):
+        anomaly_chunks.append(detector.detect_anomalies(processed_data.iloc[start:start + chunk_size]))
+        if on_progress:
+            on_progress("Detecting anomalies", min(start + chunk_size, total_rows), total_rows)
+    anomalies = pd.concat(anomaly_chunks)
+    
+    # Keep the source's history as it was before this run, to split this run's anomalies against
+    baseline = fingerprints.record(anomalies, user_ids, source, label) if fingerprints is not None else None
+    
+    if on_progress:
+        on_progress("Indexing thresholds", 0, total_rows)
+    
+    return {
+        'dataset_id': dataset_id,
+        'source': source,
+        'data': processed_data,
+        'user_ids': user_ids,
+        'anomalies': anomalies,
+        'detector': detector,
+        'thresholds': detector.get_thresholds(),
+        'explorer': ThresholdExplorer(processed_data, detector),
+        'whatif': None,
+        'ordering': None,
+        'unmatched': unmatched,
+        'unrated': processor.unrated,
+        'fingerprints': baseline
+    }
+
+def preview_dataset(sample, counts, coverage=1.0, rate_plans=None, rule_set=None):
+    """Estimate the dashboard metrics from a stratified sample, each with a 95% confidence interval"""
+    # coverage is the fraction of the file the sample was drawn from; totals are scaled up by it
+    processor = DataProcessor(rate_plans)
+    detector = AnomalyDetector(rule_set)
+    
+    strata = sample['_stratum'].to_numpy()
+    processed_data = processor.process_data(sample.drop(columns='_stratum'))
+    anomalies = detector.detect_anomalies(processed_data)
+    
+    # Per sampled row indicators, so rows dropped by cleaning count as zero
+    valid = sample.index.isin(processed_data.index).astype(float)
+    flagged = sample.index.isin(anomalies.index).astype(float)
+    billed = processed_data['billed_amount'].reindex(sample.index).fillna(0).to_numpy(dtype=float)
+    scale = 1 / coverage if coverage > 0 else 1.0
+    
+    total_records, total_records_ci = estimate_total(valid, strata, counts)
+    total_anomalies, total_anomalies_ci = estimate_total(flagged, strata, counts)
+    anomaly_rate, anomaly_rate_ci = estimate_ratio(flagged, valid, strata, counts)
+    avg_billed, avg_billed_ci = estimate_ratio(billed * valid, valid, strata, counts)
+    mean_square, _ = estimate_ratio(billed ** 2 * valid, valid, strata, counts)
+    avg_anomaly, avg_anomaly_ci = estimate_ratio(billed * flagged, flagged, strata, counts)
+    
+    # Scaling a total up from the part of the file read so far assumes the rest looks the same, an error
+    # the sampling interval says nothing about; extrapolated totals get no interval until the file is read
+    extrapolated = coverage < 1
+    
+    # (estimate, 95% confidence half-width or None) per metric
+    metrics = {
+        'total_records': (total_records * scale, None if extrapolated else total_records_ci),
+        'total_anomalies': (total_anomalies * scale, None if extrapolated else total_anomalies_ci),
+        'anomaly_rate': (anomaly_rate * 100, anomaly_rate_ci * 100),
+        'avg_billed_amount': (avg_billed, avg_billed_ci),
+        'std_billed_amount': (np.sqrt(max(mean_square - avg_billed ** 2, 0)), None),
+        'avg_anomaly_amount': (avg_anomaly, avg_anomaly_ci) if flagged.any() else (None, None)
+    }
+    
+    return {
+        'data': processed_data,
+        'anomalies': anomalies,
+        'metrics': metrics,
+        'sample_size': len(sample),
+        'coverage': coverage
+    }
\ No newline at end of file
@@ -0,0 +1,133 @@
+import json
+
+import pandas as pd
+import numpy as np
+
+class RatePlanEngine:
+    """Compute expected bills from data usage using tiered rate plans"""
+    
+    # Plan tables are JSON of the form:
+    # {"plans": {"PLAN_ID": {
+    #     "base_fee": 300,                      monthly fee charged regardless of usage
+    #     "tiers": [                            per-MB rates, each up to a usage bound in MB;
+    #         {"up_to_mb": 2000, "per_mb": 0},  a final bound of null means unlimited
+    #         {"up_to_mb": 8000, "per_mb": 0.05}
+    #     ],
+    #     "usage_cap": 400,                     optional ceiling on the tiered usage charge
+    #     "overage_per_mb": 0.2                 rate for usage beyond the last tier's bound
+    # }}}
+    
+    def __init__(self, plans):
+        if not plans:
+            raise ValueError("Rate plan table has no plans")
+        
+        self.plan_ids = list(plans)
+        self._tables = [self._build_table(plan_id, plans[plan_id]) for plan_id in self.plan_ids]
+    
+    @classmethod
+    def from_json(cls, text):
+        """Load plans from JSON text"""
+        return cls(json.loads(text).get('plans', {}))
+    
+    @classmethod
+    def from_file(cls, path):
+        """Load plans from a JSON file"""
+        with open(path) as f:
+            return cls.from_json(f.read())
+    
+    def _build_table(self, plan_id, plan):
+        """Precompute tier starts, rates and the cumulative cost at each tier start"""
+        tiers = plan.get('tiers', [])
+        if not tiers:
+            raise ValueError(f"Plan {plan_id} has no tiers")
+        
+        bounds = [tier.get('up_to_mb') for tier in tiers]
+        if any(bound is None for bound in bounds[:-1]):
+            raise ValueError(f"Plan {plan_id}: only the last tier can be unlimited")
+        ends = np.array([np.inf if bound is None else bound for bound in bounds], dtype=float)
+        rates = np.array([tier['per_mb'] for tier in tiers], dtype=float)
+        
+        if np.any(np.diff(ends) <= 0) or ends[0] <= 0:
+            raise ValueError(f"Plan {plan_id}: tier bounds must be positive and increasing")
+        if np.any(rates < 0):
+            raise ValueError(f"Plan {plan_id}: tier rates must not be negative")
+        
+        starts = np.concatenate([[0.0], ends[:-1]])
+        cumulative = np.concatenate([[0.0], np.cumsum((ends[:-1] - starts[:-1]) * rates[:-1])])
+        
+        return {
+            'base_fee': float(plan.get('base_fee', 0)),
+            'starts': starts,
+            'rates': rates,
+            'cumulative': cumulative,
+            'allowance_mb': ends[-1],
+            'usage_cap': float(plan['usage_cap']) if plan.get('usage_cap') is not None else np.inf,
+            'overage_per_mb': float(plan.get('overage_per_mb', 0))
+        }
+    
+    def compute_expected_amount(self, plan_ids, data_usage_mb):
+        """Expected bill per row; NaN where the plan is unknown or usage is missing"""
+        # Factorize the ids, then map each distinct id to its plan (-1 for unknown or missing)
+        id_codes, distinct_ids = pd.factorize(pd.Series(plan_ids))
+        plan_index = {plan_id: index for index, plan_id in enumerate(self.plan_ids)}
+        lookup = np.array([plan_index.get(self._plan_key(plan_id), -1) for plan_id in distinct_ids] + [-1])
+        
+        # Small integer codes let the stable argsort below use radix sort
+        codes = lookup[id_codes].astype(np.int16 if len(self.plan_ids) < 2 ** 15 else np.int64)
+        
+        usage = np.maximum(np.asarray(data_usage_mb, dtype=float), 0)
+        expected = np.full(len(usage), np.nan)
+        
+        # Group rows by plan once, then rate each plan's rows with one binary search
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        plan_starts = np.searchsorted(sorted_codes, np.arange(len(self.plan_ids)), side='left')
+        plan_ends = np.searchsorted(sorted_codes, np.arange(len(self.plan_ids)), side='right')
+        
+        for table, start, end in zip(self._tables, plan_starts, plan_ends):
+            rows = order[start:end]
+            if len(rows) == 0:
+                continue
+            
+            plan_usage = usage[rows]
+            tiered_usage = np.minimum(plan_usage, table['allowance_mb'])
+            tier = np.searchsorted(table['starts'], tiered_usage, side='right') - 1
+            tier = np.clip(tier, 0, len(table['starts']) - 1)
+            
+            charge = table['cumulative'][tier] + (tiered_usage - table['starts'][tier]) * table['rates'][tier]
+            charge = np.minimum(charge, table['usage_cap'])
+            charge += np.maximum(plan_usage - table['allowance_mb'], 0) * table['overage_per_mb']
+            expected[rows] = table['base_fee'] + charge
+        
+        return np.round(expected, 2)
+    
+    def apply(self, data):
+        """Set expected_amount from each row's plan_id and data_usage_mb"""
+        expected = self.compute_expected_amount(data['plan_id'], data['data_usage_mb'])
+        
+        # Rows on plans the table doesn't know keep the expected amount the file provided, if any
+        if 'expected_amount' in data.columns:
+            expected = np.where(np.isnan(expected), data['expected_amount'].to_numpy(dtype=float), expected)
+        
+        data = data.copy()
+        data['expected_amount'] = expected
+        return data
+    
+    def unrated_reasons(self, data):
+        """Why each of these rows could not be given an expected amount"""
+        plan_ids = data['plan_id']
+        keys = plan_ids.map(self._plan_key)
+        return np.where(
+            plan_ids.isna(), "Unrated bill (no plan_id)",
+            np.where(
+                keys.isin(self.plan_ids), "Unrated bill (no data usage to rate)",
+                "Unrated bill (unknown rate plan " + keys + ")"
+            )
+        )
+    
+    @staticmethod
+    def _plan_key(plan_id):
+        """Plan table key for a plan_id from a file; a numeric column with gaps reads plan 1 as 1.0"""
+        if isinstance(plan_id, (float, np.floating)) and float(plan_id).is_integer():
+            return str(int(plan_id))
+        return str(plan_id)
\ No newline at end of file
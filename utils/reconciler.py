@@ -0,0 +1,184 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+import pandas as pd
+import numpy as np
+
+class Reconciler:
+    """Join billing and usage extracts on (user_id, billing_cycle) with a partitioned hash join"""
+    
+    KEY_COLUMNS = ['user_id', 'billing_cycle']
+    BILLING_COLUMNS = KEY_COLUMNS + ['billed_amount']
+    USAGE_COLUMNS = KEY_COLUMNS + ['data_usage_mb']
+    
+    def __init__(self, partitions=16, chunk_size=100_000, memory_limit_mb=512, spill_dir=None):
+        self.partitions = partitions
+        self.chunk_size = chunk_size
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024
+        self.spill_dir = spill_dir
+    
+    def reconcile(self, billing_source, usage_source, on_progress=None, on_partition=None):
+        """Join the two CSV sources, returning (joined rows, unmatched rows from either side)"""
+        # on_progress(stage, done, total) reports progress; on_partition(joined) sees each
+        # partition's joined rows as soon as they are ready. Spilling bounds memory while the inputs
+        # are partitioned; the joined rows are collected and returned as one in-memory frame
+        work_dir = tempfile.mkdtemp(prefix='billing-reconcile-', dir=self.spill_dir)
+        try:
+            billing = self._partition(billing_source, 'billing', self.BILLING_COLUMNS, work_dir, on_progress)
+            usage = self._partition(usage_source, 'usage', self.USAGE_COLUMNS, work_dir, on_progress)
+            
+            joined_parts = []
+            unmatched_parts = []
+            joined_rows = 0
+            for partition in range(self.partitions):
+                joined, unmatched = self._join_partition(
+                    self._load_partition(billing, partition),
+                    self._load_partition(usage, partition)
+                )
+                
+                # Label each partition's rows as they will be in the final joined frame
+                joined.index = pd.RangeIndex(joined_rows, joined_rows + len(joined))
+                joined_rows += len(joined)
+                joined_parts.append(joined)
+                unmatched_parts.append(unmatched)
+                
+                if on_partition:
+                    on_partition(joined)
+                if on_progress:
+                    on_progress("Joining partitions", partition + 1, self.partitions)
+            
+            # Empty parts are left out so they don't decide the column dtypes
+            return (
+                pd.concat(joined_parts),
+                pd.concat([part for part in unmatched_parts if len(part)] or unmatched_parts[:1], ignore_index=True)
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _partition(self, source, side, required_columns, work_dir, on_progress):
+        """Stream one input into hash partitions, spilling them to disk past the memory limit"""
+        total_bytes = self._source_size(source)
+        buffers = [[] for _ in range(self.partitions)]
+        spilled = [None] * self.partitions
+        buffered_bytes = 0
+        
+        # Keys are read as strings on both sides so they hash identically
+        reader = pd.read_csv(source, chunksize=self.chunk_size, dtype={column: str for column in self.KEY_COLUMNS})
+        for chunk_number, chunk in enumerate(reader):
+            if chunk_number == 0:
+                missing_columns = [col for col in required_columns if col not in chunk.columns]
+                if missing_columns:
+                    raise ValueError(f"{side.capitalize()} file is missing columns: {', '.join(missing_columns)}")
+            
+            hashes = pd.util.hash_pandas_object(chunk[self.KEY_COLUMNS], index=False).to_numpy()
+            partition_ids = hashes % self.partitions
+            
+            # One stable sort splits the chunk into contiguous runs per partition
+            order = np.argsort(partition_ids, kind='stable')
+            bounds = np.searchsorted(partition_ids[order], np.arange(self.partitions + 1))
+            for partition in range(self.partitions):
+                rows = order[bounds[partition]:bounds[partition + 1]]
+                if len(rows):
+                    buffers[partition].append(chunk.iloc[rows])
+            
+            buffered_bytes += int(chunk.memory_usage(deep=True).sum())
+            if buffered_bytes > self.memory_limit_bytes:
+                self._spill(buffers, spilled, side, work_dir)
+                buffered_bytes = 0
+            
+            if on_progress:
+                on_progress(f"Partitioning {side} file", self._source_position(source), total_bytes)
+        
+        return {'buffers': buffers, 'spilled': spilled}
+    
+    def _spill(self, buffers, spilled, side, work_dir):
+        """Append every buffered partition to its file on disk and free the memory"""
+        for partition, frames in enumerate(buffers):
+            if not frames:
+                continue
+            if spilled[partition] is None:
+                spilled[partition] = os.path.join(work_dir, f"{side}-{partition}.pkl")
+            with open(spilled[partition], 'ab') as f:
+                for frame in frames:
+                    pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+            buffers[partition] = []
+    
+    def _load_partition(self, partitioned, partition):
+        """Read one partition back from disk and memory"""
+        frames = []
+        path = partitioned['spilled'][partition]
+        if path is not None:
+            with open(path, 'rb') as f:
+                while True:
+                    try:
+                        frames.append(pickle.load(f))
+                    except EOFError:
+                        break
+        frames.extend(partitioned['buffers'][partition])
+        return pd.concat(frames, ignore_index=True) if frames else None
+    
+    def _join_partition(self, billing, usage):
+        """Hash join one partition; rows without a partner on the other side come back as unmatched"""
+        if billing is None:
+            billing = pd.DataFrame(columns=self.BILLING_COLUMNS)
+        if usage is None:
+            usage = pd.DataFrame(columns=self.USAGE_COLUMNS)
+        
+        # Rows missing part of the key have no partner (the merge would pair them with each other)
+        usage = usage.assign(data_usage_mb=pd.to_numeric(usage['data_usage_mb'], errors='coerce'))
+        billing_keyless = billing[self.KEY_COLUMNS].isna().any(axis=1)
+        usage_keyless = usage[self.KEY_COLUMNS].isna().any(axis=1)
+        
+        # Usage extracts can hold several records per user and cycle; total them first, keeping
+        # usage that is missing on every record missing rather than 0 MB
+        keyed_usage = usage[~usage_keyless]
+        grouped = keyed_usage.groupby(self.KEY_COLUMNS, sort=False)
+        value_columns = [column for column in keyed_usage.columns if column not in self.KEY_COLUMNS]
+        numeric_columns = [column for column in value_columns if pd.api.types.is_numeric_dtype(keyed_usage[column])]
+        other_columns = [column for column in value_columns if column not in numeric_columns]
+        totals = pd.concat(
+            [grouped[numeric_columns].sum(min_count=1), grouped[other_columns].first()], axis=1
+        ).reset_index()[keyed_usage.columns]
+        
+        merged = billing[~billing_keyless].merge(
+            totals, on=self.KEY_COLUMNS, how='outer', suffixes=('', '_usage'), indicator=True
+        )
+        match_status = merged.pop('_merge')
+        
+        joined = merged[match_status == 'both'].reset_index(drop=True)
+        sides = np.where(match_status[match_status != 'both'] == 'left_only', 'billing', 'usage')
+        unmatched_parts = [
+            merged[match_status != 'both'].assign(
+                unmatched_side=sides,
+                anomaly_reason=np.where(
+                    sides == 'billing',
+                    "Unmatched billing record (no usage for this user and cycle)",
+                    "Unmatched usage record (no bill for this user and cycle)"
+                )
+            ),
+            billing[billing_keyless].assign(
+                unmatched_side='billing', anomaly_reason="Unmatched billing record (missing user_id or billing_cycle)"
+            ),
+            usage[usage_keyless].assign(
+                unmatched_side='usage', anomaly_reason="Unmatched usage record (missing user_id or billing_cycle)"
+            )
+        ]
+        unmatched = pd.concat([part for part in unmatched_parts if len(part)] or unmatched_parts[:1], ignore_index=True)
+        return joined, unmatched
+    
+    @staticmethod
+    def _source_size(source):
+        """Size in bytes of a path or seekable file"""
+        if isinstance(source, (str, os.PathLike)):
+            return os.path.getsize(source)
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    
+    @staticmethod
+    def _source_position(source):
+        """How far the CSV reader has got through a seekable file (paths report 0)"""
+        return source.tell() if hasattr(source, 'tell') else 0
\ No newline at end of file
@@ -0,0 +1,365 @@
+import ast
+import json
+
+import numpy as np
+
+class RuleSet:
+    """Anomaly rules declared as expressions over the columns, compiled into one fused evaluation plan"""
+    
+    # Rule sets are JSON of the form:
+    # {"thresholds": {"threshold": {"default": 1200, "label": "High bill above ($)"}},
+    #  "columns": {"abs_diff": "abs(expected_vs_actual_diff)"},     optional derived columns
+    #  "rules": [{"name": "high_bill",
+    #             "when": "billed_amount > threshold",
+    #             "reason": "High bill (${billed_amount:.2f})"}],
+    #  "severity": "max(billed_amount - threshold, 0) / 100"}       optional base severity per row
+    # Expressions combine column, derived column and threshold names and numbers with
+    # + - * /, abs(), max(), min(), comparisons and and/or/not. Reasons are format strings over the same names.
+    
+    # Rows are evaluated in blocks: small enough for the intermediate arrays to stay in cache,
+    # large enough that the per-step Python overhead doesn't dominate
+    BLOCK_SIZE = 65536
+    
+    # Anomalies record which rules fired as one bit per rule in a uint64
+    MAX_RULES = 64
+    
+    BINARY_OPS = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mul', ast.Div: 'div'}
+    COMPARE_OPS = {ast.Gt: '>', ast.GtE: '>=', ast.Lt: '<', ast.LtE: '<=', ast.Eq: '==', ast.NotEq: '!='}
+    FLIPPED_COMPARE_OPS = {'>': '<', '>=': '<=', '<': '>', '<=': '>=', '==': '==', '!=': '!='}
+    COMMUTATIVE_OPS = {'add', 'mul', 'max', 'min', 'and', 'or', '==', '!='}
+    FUNCTIONS = {'abs': 1, 'max': 2, 'min': 2}
+    BOOL_OPS = {'>', '>=', '<', '<=', '==', '!=', 'and', 'or', 'not'}
+    
+    UFUNCS = {
+        'add': np.add, 'sub': np.subtract, 'mul': np.multiply, 'div': np.true_divide,
+        'neg': np.negative, 'abs': np.absolute, 'max': np.maximum, 'min': np.minimum,
+        '>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+        '==': np.equal, '!=': np.not_equal,
+        'and': np.logical_and, 'or': np.logical_or, 'not': np.logical_not
+    }
+    
+    def __init__(self, spec):
+        thresholds = spec.get('thresholds', {})
+        for name, threshold in thresholds.items():
+            if not isinstance(threshold.get('default'), (int, float)):
+                raise ValueError(f"Threshold {name} needs a numeric default")
+        self.defaults = {name: threshold['default'] for name, threshold in thresholds.items()}
+        self.labels = {name: threshold.get('label', name) for name, threshold in thresholds.items()}
+        
+        # Derived columns are inlined wherever they are used, so they share the subexpression cache
+        self.derived = {}
+        for name, expression in spec.get('columns', {}).items():
+            if name in self.defaults:
+                raise ValueError(f"Column {name} has the same name as a threshold")
+            node = self._parse(expression, f"Column {name}")
+            if self._kind(node) != 'number':
+                raise ValueError(f"Column {name} must be a number, not a condition")
+            self.derived[name] = node
+        
+        self.rules = []
+        for rule in spec.get('rules', []):
+            name = rule.get('name')
+            if not name or 'when' not in rule:
+                raise ValueError("Every rule needs a name and a 'when' expression")
+            if any(existing['name'] == name for existing in self.rules):
+                raise ValueError(f"Rule {name} is defined twice")
+            
+            node = self._parse(rule['when'], f"Rule {name}")
+            if self._kind(node) != 'bool':
+                raise ValueError(f"Rule {name} must be a condition, e.g. a comparison")
+            self.rules.append({
+                'name': name,
+                'reason': rule.get('reason', name.replace('_', ' ').capitalize()),
+                'node': node,
+                'params': self._params(node),
+                'conditions': self._conditions(node)
+            })
+        
+        if not self.rules:
+            raise ValueError("Rule set has no rules")
+        if len(self.rules) > self.MAX_RULES:
+            raise ValueError(f"Rule set has {len(self.rules)} rules; at most {self.MAX_RULES} are supported")
+        
+        # Base severity of an anomaly, before the bonus per rule that fired
+        self.severity = None
+        if spec.get('severity') is not None:
+            self.severity = self._parse(spec['severity'], "Severity")
+            if self._kind(self.severity) != 'number':
+                raise ValueError("Severity must be a number, not a condition")
+        
+        self._plans = {}
+    
+    @classmethod
+    def from_json(cls, text):
+        """Load a rule set from JSON text"""
+        return cls(json.loads(text))
+    
+    @classmethod
+    def from_file(cls, path):
+        """Load a rule set from a JSON file"""
+        with open(path) as f:
+            return cls.from_json(f.read())
+    
+    def _parse(self, expression, context):
+        """Parse an expression into a tree of (op, *args) tuples"""
+        try:
+            tree = ast.parse(str(expression), mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"{context}: cannot parse '{expression}'") from e
+        return self._convert(tree, context)
+    
+    def _convert(self, node, context):
+        """Convert a Python syntax tree into an expression tree, allowing only the rule operators"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return ('const', float(node.value))
+        
+        if isinstance(node, ast.Name):
+            if node.id in self.defaults:
+                return ('param', node.id)
+            if node.id in self.derived:
+                return self.derived[node.id]
+            return ('column', node.id)
+        
+        if isinstance(node, ast.BinOp) and type(node.op) in self.BINARY_OPS:
+            return self._node(
+                self.BINARY_OPS[type(node.op)],
+                self._convert(node.left, context),
+                self._convert(node.right, context),
+                context=context
+            )
+        
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.Not)):
+            op = 'neg' if isinstance(node.op, ast.USub) else 'not'
+            return self._node(op, self._convert(node.operand, context), context=context)
+        
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in self.FUNCTIONS
+                and len(node.args) == self.FUNCTIONS[node.func.id] and not node.keywords):
+            return self._node(node.func.id, *[self._convert(arg, context) for arg in node.args], context=context)
+        
+        if isinstance(node, ast.Compare) and all(type(op) in self.COMPARE_OPS for op in node.ops):
+            # a < b < c means a < b and b < c
+            operands = [self._convert(operand, context) for operand in [node.left] + node.comparators]
+            result = None
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                comparison = self._node(self.COMPARE_OPS[type(op)], left, right, context=context)
+                result = comparison if result is None else self._node('and', result, comparison, context=context)
+            return result
+        
+        if isinstance(node, ast.BoolOp):
+            op = 'and' if isinstance(node.op, ast.And) else 'or'
+            result = self._convert(node.values[0], context)
+            for value in node.values[1:]:
+                result = self._node(op, result, self._convert(value, context), context=context)
+            return result
+        
+        raise ValueError(f"{context}: unsupported expression '{ast.unparse(node)}'")
+    
+    def _node(self, op, *args, context=''):
+        """Build one expression node, type checked, folded and in canonical form"""
+        expected = 'bool' if op in ('and', 'or', 'not') else 'number'
+        for arg in args:
+            if self._kind(arg) != expected:
+                raise ValueError(f"{context}: '{op}' needs {'conditions' if expected == 'bool' else 'numbers'}")
+        
+        # Constant subexpressions are computed here, once
+        if all(arg[0] == 'const' for arg in args):
+            with np.errstate(all='ignore'):
+                value = self.UFUNCS[op](*[arg[1] for arg in args])
+            return ('const', bool(value) if op in self.BOOL_OPS else float(value))
+        
+        # Canonical operand order lets e.g. `a > t` and `t < a` share one computation
+        if op in self.FLIPPED_COMPARE_OPS and self._is_scalar(args[0]) and not self._is_scalar(args[1]):
+            op, args = self.FLIPPED_COMPARE_OPS[op], (args[1], args[0])
+        elif op in self.COMMUTATIVE_OPS:
+            args = tuple(sorted(args, key=repr))
+        
+        return (op,) + tuple(args)
+    
+    def _kind(self, node):
+        """'bool' for conditions, 'number' for everything else"""
+        if node[0] == 'const':
+            return 'bool' if isinstance(node[1], bool) else 'number'
+        return 'bool' if node[0] in self.BOOL_OPS else 'number'
+    
+    def _is_scalar(self, node):
+        """Whether a node depends only on thresholds and constants, not on any column"""
+        if node[0] == 'column':
+            return False
+        if node[0] in ('param', 'const'):
+            return True
+        return all(self._is_scalar(arg) for arg in node[1:])
+    
+    def _params(self, node):
+        """Names of the thresholds a node refers to"""
+        if node[0] == 'param':
+            return {node[1]}
+        if node[0] in ('column', 'const'):
+            return set()
+        return set().union(*[self._params(arg) for arg in node[1:]])
+    
+    def _has_params(self, node):
+        """Whether a node refers to any threshold"""
+        return bool(self._params(node))
+    
+    def _conditions(self, node):
+        """Split a rule into (expression, op, threshold) conditions that must all hold, if it has that shape"""
+        # Rules of this shape can be re-evaluated for new thresholds by binary search over sorted columns
+        if node[0] == 'and':
+            left, right = self._conditions(node[1]), self._conditions(node[2])
+            return left + right if left is not None and right is not None else None
+        if (node[0] in ('>', '>=', '<', '<=') and node[2][0] == 'param'
+                and not self._is_scalar(node[1]) and not self._has_params(node[1])):
+            return [(node[1], node[0], node[2][1])]
+        return None
+    
+    def comparisons(self, param):
+        """Every threshold-free expression a threshold is compared against, across all rules"""
+        found = []
+        
+        def visit(node):
+            if node[0] in self.FLIPPED_COMPARE_OPS and node[2] == ('param', param) and not self._has_params(node[1]):
+                if node[1] not in found:
+                    found.append(node[1])
+            if node[0] not in ('column', 'param', 'const'):
+                for arg in node[1:]:
+                    visit(arg)
+        
+        for rule in self.rules:
+            visit(rule['node'])
+        return found
+    
+    def _plan(self, rule_indices):
+        """Compile the given rules into one instruction list over shared, reused buffers"""
+        if rule_indices in self._plans:
+            return self._plans[rule_indices]
+        
+        # Post-order walk; each distinct subexpression becomes one step no matter how many rules use it
+        refs = {}
+        steps = []
+        scalars = []
+        columns = []
+        
+        def visit(node):
+            if node in refs:
+                return refs[node]
+            if node[0] == 'column':
+                if node[1] not in columns:
+                    columns.append(node[1])
+                ref = ('column', node[1])
+            elif self._is_scalar(node):
+                scalars.append(node)
+                ref = ('scalar', len(scalars) - 1)
+            else:
+                args = [visit(arg) for arg in node[1:]]
+                steps.append((node[0], node, args))
+                ref = ('buffer', node)
+            refs[node] = ref
+            return ref
+        
+        for position, index in enumerate(rule_indices):
+            steps.append(('store', position, [visit(self.rules[index]['node'])]))
+        
+        # A buffer is free for reuse after the last step that reads it, so only the live
+        # intermediates of the expression being evaluated take up memory
+        last_use = {}
+        for step_number, (_, _, args) in enumerate(steps):
+            for ref in args:
+                if ref[0] == 'buffer':
+                    last_use[ref[1]] = step_number
+        
+        slot_dtypes = []
+        free_slots = {bool: [], float: []}
+        slot_of = {}
+        instructions = []
+        for step_number, (op, target, args) in enumerate(steps):
+            operands = []
+            for ref in args:
+                if ref[0] == 'buffer':
+                    slot = slot_of[ref[1]]
+                    operands.append(('buffer', slot))
+                    if last_use[ref[1]] == step_number and slot not in free_slots[slot_dtypes[slot]]:
+                        free_slots[slot_dtypes[slot]].append(slot)
+                else:
+                    operands.append(ref)
+            
+            if op == 'store':
+                instructions.append((op, target, operands))
+                continue
+            
+            # Inputs freed by this step can take its output; elementwise ufuncs allow that
+            dtype = bool if op in self.BOOL_OPS else float
+            if free_slots[dtype]:
+                slot = free_slots[dtype].pop()
+            else:
+                slot = len(slot_dtypes)
+                slot_dtypes.append(dtype)
+            slot_of[target] = slot
+            instructions.append((op, slot, operands))
+        
+        plan = {'instructions': instructions, 'scalars': scalars, 'columns': columns, 'slot_dtypes': slot_dtypes}
+        self._plans[rule_indices] = plan
+        return plan
+    
+    def evaluate(self, data, thresholds, rule_names=None):
+        """Evaluate rules over the data, returning a boolean mask per rule name"""
+        names = [rule['name'] for rule in self.rules] if rule_names is None else list(rule_names)
+        positions = {rule['name']: index for index, rule in enumerate(self.rules)}
+        plan = self._plan(tuple(positions[name] for name in names))
+        
+        size = len(data)
+        columns = {name: self.column_array(data, name) for name in plan['columns']}
+        scalars = [self._evaluate_scalar(node, thresholds) for node in plan['scalars']]
+        masks = np.empty((len(names), size), dtype=bool)
+        
+        # Preallocate one block-sized array per buffer slot and run every step block by block
+        block_size = min(self.BLOCK_SIZE, max(size, 1))
+        buffers = [np.empty(block_size, dtype=dtype) for dtype in plan['slot_dtypes']]
+        
+        with np.errstate(all='ignore'):
+            for start in range(0, size, block_size):
+                stop = min(start + block_size, size)
+                length = stop - start
+                for op, target, operands in plan['instructions']:
+                    values = [
+                        buffers[ref[1]][:length] if ref[0] == 'buffer'
+                        else columns[ref[1]][start:stop] if ref[0] == 'column'
+                        else scalars[ref[1]]
+                        for ref in operands
+                    ]
+                    if op == 'store':
+                        np.copyto(masks[target, start:stop], values[0])
+                    else:
+                        self.UFUNCS[op](*values, out=buffers[target][:length])
+        
+        return dict(zip(names, masks))
+    
+    def _evaluate_scalar(self, node, thresholds):
+        """Value of a node that depends only on thresholds and constants"""
+        if node[0] == 'const':
+            return node[1]
+        if node[0] == 'param':
+            return thresholds[node[1]]
+        with np.errstate(all='ignore'):
+            return self.UFUNCS[node[0]](*[self._evaluate_scalar(arg, thresholds) for arg in node[1:]])
+    
+    def evaluate_node(self, data, node, thresholds=None):
+        """Values of one expression for every row"""
+        if node[0] == 'column':
+            return self.column_array(data, node[1])
+        if self._is_scalar(node):
+            return np.full(len(data), self._evaluate_scalar(node, thresholds or self.defaults))
+        with np.errstate(all='ignore'):
+            return self.UFUNCS[node[0]](*[self.evaluate_node(data, arg, thresholds) for arg in node[1:]])
+    
+    def column_values(self, data, name, thresholds=None):
+        """Values of a data or derived column as a float array"""
+        if name in self.derived:
+            return self.evaluate_node(data, self.derived[name], thresholds)
+        return self.column_array(data, name)
+    
+    @staticmethod
+    def column_array(data, name):
+        """A data column as a float array"""
+        if name not in data.columns:
+            raise ValueError(f"Rule column not in data: {name}")
+        return data[name].to_numpy(dtype=float)
\ No newline at end of file
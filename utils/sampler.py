@@ -0,0 +1,116 @@
+import threading
+
+import pandas as pd
+import numpy as np
+
+from utils.data_processor import DataProcessor
+
+class StratifiedReservoirSampler:
+    """Keep a uniform random sample per (billing_cycle, amount band) stratum in one streaming pass"""
+    
+    def __init__(self, per_stratum=2000, amount_bands=(250, 500, 1000, 1500, 2500), seed=42):
+        self.per_stratum = per_stratum
+        self.amount_bands = np.asarray(amount_bands, dtype=float)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        
+        self._stratum_ids = {}
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._reservoir = None
+        self.rows_seen = 0
+    
+    def _assign_strata(self, chunk):
+        """Map every row of a chunk to its stratum id, registering new strata"""
+        # Files without cycles get the demo cycles processing will give the same rows
+        if 'billing_cycle' in chunk.columns:
+            cycle_codes, cycles = pd.factorize(chunk['billing_cycle'].astype(str))
+        else:
+            cycle_codes, cycles = pd.factorize(DataProcessor.demo_billing_cycles(chunk.index))
+        
+        # Bands are right-open amount ranges; unparseable amounts get band 0
+        amounts = pd.to_numeric(chunk['billed_amount'], errors='coerce').to_numpy(dtype=float)
+        bands = np.where(np.isnan(amounts), 0, np.searchsorted(self.amount_bands, amounts, side='right') + 1)
+        
+        # Combine both codes into one integer key, then register each distinct key once
+        band_count = len(self.amount_bands) + 2
+        keys, key_codes = np.unique(cycle_codes * band_count + bands, return_inverse=True)
+        key_ids = np.array([
+            self._stratum_ids.setdefault((cycles[key // band_count], int(key % band_count)), len(self._stratum_ids))
+            for key in keys
+        ], dtype=np.int64)
+        return key_ids[key_codes] if len(key_codes) else np.zeros(0, dtype=np.int64)
+    
+    def add(self, chunk):
+        """Offer one chunk of raw rows to the sample"""
+        with self._lock:
+            strata = self._assign_strata(chunk)
+            if len(self._counts) < len(self._stratum_ids):
+                self._counts = np.concatenate([self._counts, np.zeros(len(self._stratum_ids) - len(self._counts), dtype=np.int64)])
+            self._counts += np.bincount(strata, minlength=len(self._counts))
+            self.rows_seen += len(chunk)
+            
+            # Every row draws a random priority; each stratum keeps its per_stratum lowest,
+            # which is a uniform sample without replacement of everything seen so far
+            priorities = self._rng.random(len(chunk))
+            cutoffs = np.ones(len(self._counts))
+            if self._reservoir is not None:
+                by_stratum = self._reservoir.groupby('_stratum')['_priority']
+                full = by_stratum.size() >= self.per_stratum
+                cutoffs[full[full].index.to_numpy()] = by_stratum.max()[full].to_numpy()
+            
+            # Rows that cannot beat their stratum's current cutoff never leave the chunk
+            keep = priorities < cutoffs[strata]
+            candidates = chunk[keep].assign(_stratum=strata[keep], _priority=priorities[keep])
+            
+            merged = candidates if self._reservoir is None else pd.concat([self._reservoir, candidates])
+            merged = merged.sort_values('_priority', kind='stable')
+            self._reservoir = merged[merged.groupby('_stratum').cumcount() < self.per_stratum]
+    
+    def sample(self):
+        """Get the current sample, with each row's stratum and design weight, plus the stratum sizes"""
+        with self._lock:
+            if self._reservoir is None:
+                return None, np.zeros(0, dtype=np.int64)
+            
+            sample = self._reservoir.drop(columns='_priority').sort_index()
+            counts = self._counts.copy()
+        
+        sample_sizes = np.bincount(sample['_stratum'], minlength=len(counts))
+        sample['sample_weight'] = (counts / np.maximum(sample_sizes, 1))[sample['_stratum'].to_numpy()]
+        return sample, counts
+
+def estimate_total(values, strata, counts):
+    """Stratified estimate of a population total, with the half-width of its 95% confidence interval"""
+    values = np.asarray(values, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    sample_sizes = np.bincount(strata, minlength=len(counts)).astype(float)
+    sampled = sample_sizes > 0
+    
+    sums = np.bincount(strata, weights=values, minlength=len(counts))
+    squares = np.bincount(strata, weights=values ** 2, minlength=len(counts))
+    means = np.divide(sums, sample_sizes, out=np.zeros(len(counts)), where=sampled)
+    
+    # Within-stratum sample variance (zero for strata with a single sampled row)
+    degrees = np.maximum(sample_sizes - 1, 1)
+    variances = np.maximum(squares - sample_sizes * means ** 2, 0) / degrees
+    
+    # Finite population correction: a stratum sampled in full contributes no error
+    fpc = 1 - np.divide(sample_sizes, counts, out=np.ones(len(counts)), where=counts > 0)
+    variance = np.sum(np.divide(counts ** 2 * fpc * variances, sample_sizes, out=np.zeros(len(counts)), where=sampled))
+    
+    return float(np.sum(counts * means)), float(1.96 * np.sqrt(variance))
+
+def estimate_ratio(numerator, denominator, strata, counts):
+    """Stratified ratio estimate (e.g. a mean or a rate), with the half-width of its 95% confidence interval"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    
+    numerator_total, _ = estimate_total(numerator, strata, counts)
+    denominator_total, _ = estimate_total(denominator, strata, counts)
+    if denominator_total == 0:
+        return 0.0, 0.0
+    
+    # Linearized variance: the error of the residuals around the ratio
+    ratio = numerator_total / denominator_total
+    _, residual_interval = estimate_total(numerator - ratio * denominator, strata, counts)
+    return ratio, residual_interval / abs(denominator_total)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import pandas as pd
+import numpy as np
+
+class ThresholdExplorer:
+    """Re-evaluate anomaly rules for what-if thresholds without re-running detection"""
+    
+    def __init__(self, data, detector):
+        self.data = data
+        self.detector = detector
+        rule_set = detector.rule_set
+        
+        # Rules that only compare expressions against thresholds are re-evaluated by binary search;
+        # any others go through the rule set's compiled plan
+        self._indexed_rules = [rule for rule in detector.rules if rule['conditions'] is not None]
+        self._planned_rules = [rule['name'] for rule in detector.rules if rule['conditions'] is None]
+        
+        expressions = [column for rule in self._indexed_rules for column, _, _ in rule['conditions']]
+        for param in detector.threshold_labels:
+            expressions.extend(rule_set.comparisons(param))
+        
+        # Sort every expression a threshold is compared against once, so any threshold is a binary search
+        self._sorted_columns = {}
+        for column in expressions:
+            if column not in self._sorted_columns:
+                values = rule_set.evaluate_node(data, column)
+                order = np.argsort(values, kind='stable')
+                valid_count = int(np.count_nonzero(~np.isnan(values)))
+                self._sorted_columns[column] = (values[order], order, valid_count)
+    
+    def _find_condition(self, param):
+        """Find the rule and condition a threshold belongs to, or None if it isn't used in exactly one condition"""
+        if param not in self.detector.threshold_labels:
+            raise ValueError(f"Unknown threshold: {param}")
+        
+        matches = [
+            (rule, condition) for rule in self._indexed_rules
+            for condition in rule['conditions'] if condition[2] == param
+        ]
+        users = [rule for rule in self.detector.rules if param in rule['params']]
+        return matches[0] if len(matches) == 1 and len(users) == 1 else None
+    
+    def value_range(self, param):
+        """Get the (min, max) of the values a threshold is compared against"""
+        comparisons = self.detector.rule_set.comparisons(param)
+        if not comparisons:
+            default = self.detector.get_thresholds()[param]
+            return float(default), float(default)
+        
+        # Infinities (e.g. from dividing by zero) sort to the ends and are left out of the range
+        sorted_values, _, valid_count = self._sorted_columns[comparisons[0]]
+        first = np.searchsorted(sorted_values[:valid_count], -np.inf, side='right')
+        last = np.searchsorted(sorted_values[:valid_count], np.inf, side='left')
+        if last <= first:
+            return 0.0, 0.0
+        return float(sorted_values[first]), float(sorted_values[last - 1])
+    
+    def condition_mask(self, column, op, value):
+        """Boolean mask of rows where `column <op> value` holds, found by binary search"""
+        sorted_values, order, valid_count = self._sorted_columns[column]
+        mask = np.zeros(len(order), dtype=bool)
+        
+        # NaNs sort to the end and never satisfy a comparison
+        if op in ('>', '>='):
+            start = np.searchsorted(sorted_values[:valid_count], value, side='right' if op == '>' else 'left')
+            mask[order[start:valid_count]] = True
+        else:
+            end = np.searchsorted(sorted_values[:valid_count], value, side='left' if op == '<' else 'right')
+            mask[order[:end]] = True
+        
+        return mask
+    
+    def rule_masks(self, thresholds):
+        """Evaluate every rule for the given thresholds"""
+        masks = {}
+        if self._planned_rules:
+            masks.update(self.detector.evaluate_rules(self.data, thresholds, self._planned_rules))
+        
+        for rule in self._indexed_rules:
+            mask = np.ones(len(self.data), dtype=bool)
+            for column, op, param in rule['conditions']:
+                mask &= self.condition_mask(column, op, thresholds[param])
+            masks[rule['name']] = mask
+        
+        return {rule['name']: masks[rule['name']] for rule in self.detector.rules}
+    
+    def count_anomalies(self, thresholds):
+        """Count flagged rows per rule and in total for the given thresholds"""
+        masks = self.rule_masks(thresholds)
+        counts = {name: int(mask.sum()) for name, mask in masks.items()}
+        counts['total'] = int(np.logical_or.reduce(list(masks.values())).sum())
+        return counts
+    
+    def anomalies(self, thresholds):
+        """Build the anomaly report for the given thresholds; reasons are left for describe_anomalies"""
+        return self.detector.build_anomalies(self.data, self.rule_masks(thresholds), thresholds, reasons=False)
+    
+    def sweep(self, param, values, thresholds):
+        """Count anomalies for each candidate value of one threshold, holding the others fixed"""
+        values = np.asarray(values, dtype=float)
+        found = self._find_condition(param)
+        
+        # A threshold used in several places, or inside a general expression, is swept by re-evaluating
+        if found is None:
+            return pd.DataFrame({
+                'threshold': values,
+                'anomaly_count': [self.count_anomalies({**thresholds, param: value})['total'] for value in values]
+            })
+        
+        swept_rule, (column, op, _) = found
+        masks = self.rule_masks(thresholds)
+        
+        # Rows flagged by another rule stay anomalous whatever the swept threshold is
+        other = np.zeros(len(self.data), dtype=bool)
+        for rule in self.detector.rules:
+            if rule is not swept_rule:
+                other |= masks[rule['name']]
+        
+        # The remaining rows are flagged once the swept condition and its partner conditions all hold
+        candidates = ~other
+        for partner_column, partner_op, partner_param in swept_rule['conditions']:
+            if partner_param != param:
+                candidates &= self.condition_mask(partner_column, partner_op, thresholds[partner_param])
+        
+        # Keep the presorted candidate values so every sweep point is a single binary search
+        sorted_values, order, valid_count = self._sorted_columns[column]
+        candidate_values = sorted_values[:valid_count][candidates[order[:valid_count]]]
+        
+        if op in ('>', '>='):
+            passing = len(candidate_values) - np.searchsorted(
+                candidate_values, values, side='right' if op == '>' else 'left'
+            )
+        else:
+            passing = np.searchsorted(candidate_values, values, side='left' if op == '<' else 'right')
+        
+        return pd.DataFrame({
+            'threshold': values,
+            'anomaly_count': int(other.sum()) + passing
+        })
\ No newline at end of file